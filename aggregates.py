@@ -0,0 +1,240 @@
+# Derived tables shared by the dashboard and the analysis script.
+#
+# Every groupby the two entry points need is computed once per version of the census
+# data (identified by the content hashes of its files) and kept for the life of the
+# process. `panel serve` re-runs `dashboard.py` for each session, but this module is only
+# imported once, so all sessions in a server process share the same frames. Treat them
+# as read-only.
+#
+# A new census year dropped next to the census CSV (see `census_data.census_year_files`)
+# is merged into the existing tables on the next call to `get_aggregates`: only the new
+# file is parsed, sums are added and means are combined using the stored row counts.
+# Investment metrics and yearly estimates are only computed for the years the new rows
+# change, and the location join and spatial index are kept when no neighbourhood is new.
+
+import copy
+import hashlib
+import threading
+import warnings
+from collections.abc import Mapping
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from census_data import CENSUS_DATA_PATH, COORDINATES_PATH, census_year_files, dwelling_types, file_hash, load_census_data, load_census_year, load_neighbourhood_locations
+from investment_metrics import append_investment_metrics, investment_metrics
+from rankings import TopNRanking
+from spatial_index import SpatialIndex
+from temporal_interpolation import AnnualEstimates
+
+
+class NeighbourhoodRows(Mapping):
+    # Row positions of each neighbourhood, read like a dict of name -> positions in the
+    # order of the categories. The positions are kept in one array sorted by neighbourhood,
+    # so it is built with one stable sort of the category codes instead of a loop.
+    def __init__(self, neighbourhood):
+        # neighbourhood is the categorical neighbourhood column of to_data
+        codes = np.asarray(neighbourhood.cat.codes)
+        counts = np.bincount(codes[codes >= 0], minlength=len(neighbourhood.cat.categories))
+        # Rows without a neighbourhood (code -1) sort first and are dropped
+        self._positions = np.argsort(codes, kind='stable')[np.count_nonzero(codes < 0):]
+        ends = np.cumsum(counts)
+        present = np.flatnonzero(counts)
+        self.names = pd.Index(neighbourhood.cat.categories[present], name='neighbourhood')
+        self._starts, self._ends = (ends - counts)[present], ends[present]
+
+    def __getitem__(self, neighbourhood):
+        position = self.names.get_loc(neighbourhood)
+        return self._positions[self._starts[position]:self._ends[position]]
+
+    def __contains__(self, neighbourhood):
+        return neighbourhood in self.names
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+@dataclass(frozen=True)
+class CensusAggregates:
+    # (path, content hash) of every file the data was built from
+    sources: tuple
+    to_data: pd.DataFrame
+    # Sum of each dwelling type per year
+    no_of_dwelling_by_year: pd.DataFrame
+    # Mean monthly shelter costs for owned and rented dwellings per year
+    monthly_avg_costs_by_year: pd.DataFrame
+    # Mean house value per year
+    avg_house_value: pd.Series
+    # Mean house value per neighbourhood over all years
+    neighbourhoods_value_avg: pd.DataFrame
+    # Rows per year and per neighbourhood, used to combine means when rows are appended
+    year_counts: pd.Series
+    neighbourhood_counts: pd.Series
+    # Row positions in to_data for each neighbourhood
+    neighbourhood_rows: NeighbourhoodRows
+    # Neighbourhood coordinates, indexed by neighbourhood
+    locations: pd.DataFrame
+    # Coordinates joined with neighbourhoods_value_avg, one row per neighbourhood
+    neighbourhood_value_locations: pd.DataFrame
+    # Grid index over the coordinates of neighbourhood_value_locations; queries return its rows
+    spatial_index: SpatialIndex
+    # Per-year and all-years top neighbourhoods by house value and owned shelter costs
+    rankings: TopNRanking
+    # Price-to-rent, yield, growth and cost spread for every row of to_data
+    investment_metrics: pd.DataFrame
+    # Yearly estimates of the census columns between census years, per neighbourhood and citywide
+    annual_estimates: AnnualEstimates
+
+    @property
+    def version(self):
+        return hashlib.sha256("".join(digest for _, digest in self.sources).encode()).hexdigest()
+
+    @property
+    def years(self):
+        return self.no_of_dwelling_by_year.index.tolist()
+
+    def neighbourhood_data(self, neighbourhood, columns):
+        # Slices one neighbourhood's rows without scanning the whole frame
+        return self.to_data.iloc[self.neighbourhood_rows[neighbourhood]][columns]
+
+
+_lock = threading.Lock()
+_cache = {}
+# path -> content hash of census year files that failed validation
+_rejected = {}
+
+
+# How each derived table is computed from the census rows
+table_builders = dict(
+    no_of_dwelling_by_year=lambda to_data: to_data.loc[:,dwelling_types].groupby(by='year').sum(),
+    monthly_avg_costs_by_year=lambda to_data: to_data.loc[:,['shelter_costs_owned','shelter_costs_rented']].groupby(by='year').mean(),
+    avg_house_value=lambda to_data: to_data['average_house_value'].groupby(by='year').mean(),
+    neighbourhoods_value_avg=lambda to_data: to_data.loc[:,['neighbourhood','average_house_value']].groupby('neighbourhood', observed=True).mean(),
+    year_counts=lambda to_data: to_data.groupby(by='year').size(),
+    neighbourhood_counts=lambda to_data: to_data.groupby('neighbourhood', observed=True).size(),
+)
+
+
+def derived_tables(to_data):
+    return {name: build(to_data) for name, build in table_builders.items()}
+
+
+def join_locations(locations, neighbourhoods_value_avg):
+    neighbourhood_avg_value_with_location = pd.concat([locations, neighbourhoods_value_avg], axis=1)
+    neighbourhood_avg_value_with_location.index.name = 'neighbourhood'
+    return neighbourhood_avg_value_with_location.reset_index()
+
+
+def compute_aggregates(to_data, locations, sources=()):
+    tables = derived_tables(to_data)
+    locations = locations.set_index('neighbourhood')
+    neighbourhood_value_locations = join_locations(locations, tables['neighbourhoods_value_avg'])
+    return CensusAggregates(
+        sources=tuple(sources),
+        to_data=to_data,
+        neighbourhood_rows=NeighbourhoodRows(to_data['neighbourhood']),
+        locations=locations,
+        neighbourhood_value_locations=neighbourhood_value_locations,
+        spatial_index=SpatialIndex.from_frame(neighbourhood_value_locations),
+        rankings=TopNRanking.from_frame(to_data),
+        investment_metrics=investment_metrics(to_data),
+        annual_estimates=AnnualEstimates.from_frame(to_data),
+        **tables,
+    )
+
+
+def combine_means(means, counts, other_means, other_counts):
+    total = counts.add(other_counts, fill_value=0)
+    weighted = means.mul(counts, axis=0).add(other_means.mul(other_counts, axis=0), fill_value=0)
+    return weighted.div(total, axis=0), total
+
+
+def concat_census(to_data, rows):
+    # Keep the neighbourhood column categorical, with the existing categories first
+    categories = to_data['neighbourhood'].cat.categories
+    categories = categories.append(rows['neighbourhood'].cat.categories.difference(categories))
+    dtype = pd.CategoricalDtype(categories)
+    return pd.concat([to_data.assign(neighbourhood=to_data['neighbourhood'].astype(dtype)),
+                      rows.assign(neighbourhood=rows['neighbourhood'].astype(dtype))])
+
+
+def append_rows(census, rows, source):
+    added = derived_tables(rows)
+    monthly_avg_costs_by_year, year_counts = combine_means(census.monthly_avg_costs_by_year, census.year_counts, added['monthly_avg_costs_by_year'], added['year_counts'])
+    avg_house_value, _ = combine_means(census.avg_house_value, census.year_counts, added['avg_house_value'], added['year_counts'])
+    neighbourhoods_value_avg, neighbourhood_counts = combine_means(census.neighbourhoods_value_avg, census.neighbourhood_counts, added['neighbourhoods_value_avg'], added['neighbourhood_counts'])
+
+    # Sessions may still hold the previous version, so its ranking is not modified
+    rankings = copy.deepcopy(census.rankings)
+    rankings.append(rows)
+    if len(neighbourhoods_value_avg) == len(census.neighbourhoods_value_avg):
+        # No new neighbourhoods: the coordinates, and so the spatial index, are unchanged
+        positions = neighbourhoods_value_avg.index.get_indexer(census.neighbourhood_value_locations['neighbourhood'])
+        neighbourhood_value_locations = census.neighbourhood_value_locations.assign(average_house_value=neighbourhoods_value_avg['average_house_value'].to_numpy()[positions])
+        spatial_index = census.spatial_index
+    else:
+        neighbourhood_value_locations = join_locations(census.locations, neighbourhoods_value_avg)
+        spatial_index = SpatialIndex.from_frame(neighbourhood_value_locations)
+    to_data = concat_census(census.to_data, rows)
+
+    return CensusAggregates(
+        sources=census.sources + (source,),
+        to_data=to_data,
+        no_of_dwelling_by_year=census.no_of_dwelling_by_year.add(added['no_of_dwelling_by_year'], fill_value=0).astype(census.no_of_dwelling_by_year.dtypes),
+        monthly_avg_costs_by_year=monthly_avg_costs_by_year,
+        avg_house_value=avg_house_value.rename(census.avg_house_value.name),
+        neighbourhoods_value_avg=neighbourhoods_value_avg,
+        year_counts=year_counts.astype(int),
+        neighbourhood_counts=neighbourhood_counts.astype(int),
+        neighbourhood_rows=NeighbourhoodRows(to_data['neighbourhood']),
+        locations=census.locations,
+        neighbourhood_value_locations=neighbourhood_value_locations,
+        spatial_index=spatial_index,
+        rankings=rankings,
+        investment_metrics=append_investment_metrics(census.investment_metrics, to_data, len(rows)),
+        annual_estimates=census.annual_estimates.appended(to_data, len(rows)),
+    )
+
+
+def save_dwelling_totals(no_of_dwelling_by_year, path):
+    # Writes no_of_dwelling_by_year as CSV. When the file already holds the same table up
+    # to an earlier year, only the new years are appended instead of rewriting it.
+    path = Path(path)
+    if path.exists():
+        saved = pd.read_csv(path, index_col='year')
+        start = len(saved)
+        if (list(saved.columns) == list(no_of_dwelling_by_year.columns) and start <= len(no_of_dwelling_by_year)
+                and np.array_equal(saved.index, no_of_dwelling_by_year.index[:start])
+                and np.array_equal(saved.to_numpy(), no_of_dwelling_by_year.to_numpy()[:start])):
+            no_of_dwelling_by_year.iloc[start:].to_csv(path, mode='a', header=False)
+            return
+    no_of_dwelling_by_year.to_csv(path)
+
+
+def get_aggregates(path=CENSUS_DATA_PATH, coordinates_path=COORDINATES_PATH):
+    path = Path(path)
+    key = (path, Path(coordinates_path))
+    base = ((str(path), file_hash(path)), (str(coordinates_path), file_hash(coordinates_path)))
+    year_sources = [(str(year_path), file_hash(year_path)) for year_path in census_year_files(path)]
+    year_sources = [source for source in year_sources if _rejected.get(source[0]) != source[1]]
+    with _lock:
+        cached = _cache.get(key)
+        sources = (*base, *year_sources)
+        # Rebuild from scratch unless the cached data is a prefix of the current files
+        if cached is None or cached.sources != sources[:len(cached.sources)]:
+            cached = compute_aggregates(load_census_data(path), load_neighbourhood_locations(coordinates_path), base)
+        for source in sources[len(cached.sources):]:
+            try:
+                rows = load_census_year(source[0], cached.years)
+            except ValueError as error:
+                warnings.warn(f"Skipping census year file {source[0]}: {error}")
+                _rejected[source[0]] = source[1]
+                continue
+            cached = append_rows(cached, rows, source)
+        _cache[key] = cached
+        return cached
@@ -0,0 +1,86 @@
+# Builds dashboard panes on a thread pool instead of the server's event loop.
+#
+# `panel serve` creates every session on its single Tornado event loop, so a pane that
+# takes a second to build (the facet bar, the map) would hold up every other user for that
+# second. `async_pane` wraps a pane builder in a coroutine that runs it in `pane_executor`
+# and awaits the result. Panel renders a loading placeholder in its place and swaps the
+# pane in once it is built, while the event loop keeps serving other sessions.
+#
+# The executor is shared by all sessions of a server process and sized with
+# DASHBOARD_PANE_WORKERS (default 4). Threads rather than processes are used because the
+# builders return Panel and HoloViews objects bound to this process's data; the pandas
+# and JSON work in them still contends for the GIL, but never blocks the loop for a
+# whole build. Outside a server (a notebook, the benchmarks) Panel runs the coroutine to
+# completion straight away.
+#
+# Swapping a built pane in converts it to Bokeh models under the session's document lock,
+# on the event loop, and for a Plotly figure or a HoloViews plot that conversion can take
+# as long as the build. So the worker also does whatever part of it needs no document
+# (`off_loop`): a Plotly figure, or figure dict, is wrapped in a `PreparedPlotly` pane
+# whose model properties (the figure's JSON and its data sources) are computed up front,
+# and a HoloViews object without widgets (no HoloMap or DynamicMap in it) is rendered to a
+# Bokeh figure. Layouts are rebuilt with their items converted, so cached layouts shared
+# by several sessions are not modified. Interactive HoloViews objects are left to Panel.
+
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+import panel as pn
+
+pane_executor = ThreadPoolExecutor(max_workers=int(os.getenv("DASHBOARD_PANE_WORKERS", "4")), thread_name_prefix="pane-builder")
+
+
+class PreparedPlotly(pn.pane.Plotly):
+    # A Plotly pane whose model properties can be computed ahead of time with `prepare`.
+    # They are used for the first model created afterwards, if the figure is unchanged;
+    # data sources cannot be shared between models, so later models compute their own.
+    _prepared = None
+
+    def prepare(self):
+        self._prepared = (self.object, super()._init_params())
+        return self
+
+    def _init_params(self):
+        prepared, self._prepared = self._prepared, None
+        if prepared is not None and prepared[0] is self.object:
+            return prepared[1]
+        return super()._init_params()
+
+
+def off_loop(obj):
+    # obj, or an equivalent pane, with as much of its Bokeh conversion done as possible
+    # without a document
+    if isinstance(obj, PreparedPlotly):
+        return obj.prepare()
+    if pn.pane.Plotly.applies(obj):
+        # A Plotly figure, or a figure dict from the figure cache
+        return PreparedPlotly(obj).prepare()
+    if isinstance(obj, pn.layout.ListPanel):
+        items = [off_loop(item) for item in obj]
+        if any(item is not original for item, original in zip(items, obj)):
+            return obj.clone(*items)
+        return obj
+    # HoloViews is only imported by the panes that draw with it
+    hv = sys.modules.get("holoviews")
+    element = obj.object if isinstance(obj, pn.pane.HoloViews) else obj
+    if hv is not None and isinstance(element, hv.core.Dimensioned) and not element.traverse(lambda element: element, [hv.HoloMap]):
+        return pn.pane.Bokeh(hv.render(element, backend="bokeh"))
+    return obj
+
+
+def in_executor(fn):
+    # A coroutine function running fn, and the conversion of its result, in the pane executor
+    @wraps(fn)
+    async def run(*args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pane_executor, lambda: off_loop(fn(*args, **kwargs)))
+    return run
+
+
+def async_pane(fn, *args, **kwargs):
+    # A placeholder that is replaced by fn(*args, **kwargs) once it has been built. Widget
+    # arguments are bound as with pn.bind, so changing them rebuilds the pane in the executor.
+    return pn.panel(pn.bind(in_executor(fn), *args, **kwargs), loading_indicator=True)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Headless batch export of the rental analysis charts
+#
+# Renders every chart from `rental_analysis.py` for one or more census files, without a
+# display, and writes them under an output directory:
+#
+#     python batch_export.py Data/toronto_neighbourhoods_census_data.csv other_city.csv \
+#         --output-dir exports --formats png svg html --workers 4
+#
+# Each census file is handled by one worker of a process pool and gets its own
+# sub-directory named after the file. The matplotlib charts are written as PNG/SVG, and
+# HTML gets an inline SVG. The Plotly charts, including the neighbourhood map, are always
+# written as HTML, and as PNG/SVG when kaleido is installed. Per-chart timings are printed
+# at the end and saved to `timings.csv` in the output directory.
+#
+# Each census file is mapped with the coordinates file next to it, named after the census
+# file without a trailing `_census_data` (`Data/toronto_neighbourhoods_coordinates.csv`
+# for the bundled data, `other_city_coordinates.csv` for `other_city.csv`). `--coordinates`
+# gives one coordinates file per census file instead, in the same order. The map uses the
+# Mapbox token from the `mapbox` environment variable (or `.env`), and OpenStreetMap tiles
+# when there is none.
+
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import StringIO
+from pathlib import Path
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import plotly.express as px
+from dotenv import load_dotenv
+
+from aggregates import get_aggregates, save_dwelling_totals
+from level_of_detail import aggregate_points, needs_level_of_detail
+
+formats = ("png", "svg", "html")
+bar_colors = ["red", "blue", "orange", "purple"]
+
+
+def create_bar_chart(data, title, xlabel, ylabel, color):
+    figure = plt.figure(figsize=(10,8))
+    plot = data.plot.bar(title=title,color=color)
+    plot.set_xlabel(xlabel)
+    plot.set_ylabel(ylabel)
+    return figure
+
+
+def create_line_chart(data, title, xlabel, ylabel, color):
+    figure = plt.figure(figsize=(10,8))
+    plot = data.plot.line(title=title,color=color)
+    plot.set_xlabel(xlabel)
+    plot.set_ylabel(ylabel)
+    return figure
+
+
+def create_map_chart(census):
+    locations = census.neighbourhood_value_locations
+    # Map tiles need a Mapbox token; without one the map is drawn on OpenStreetMap tiles
+    token = os.getenv("mapbox")
+    px.set_mapbox_access_token(token)
+    style = None if token else "open-street-map"
+    if needs_level_of_detail(len(locations)):
+        # Too many neighbourhoods for one trace each; merged into grid cells as on the dashboard
+        return px.scatter_mapbox(aggregate_points(locations, 10), lat="lat", lon="lon", size="neighbourhoods", color="average_house_value", hover_name="label", mapbox_style=style, title="Average House Values in Toronto", zoom=10, width=1500, height=800)
+    return px.scatter_mapbox(locations, lat="lat", lon="lon", size="average_house_value", color="neighbourhood", mapbox_style=style, title="Average House Values in Toronto", zoom=10, width=1500, height=800)
+
+
+def analysis_charts(census):
+    # (name, builder) for every chart in the analysis; builders run lazily so they can be timed
+    charts = []
+    for i, year in enumerate(census.years):
+        charts.append((f"dwelling_types_{year}", lambda year=year, color=bar_colors[i % len(bar_colors)]: create_bar_chart(census.no_of_dwelling_by_year.loc[year], f"Dwelling Types in Toronto in {year}", year, "Dwelling type Units", color)))
+    charts += [
+        ("shelter_costs_owned", lambda: create_line_chart(census.monthly_avg_costs_by_year['shelter_costs_owned'], 'Average Monthly Shelter Cost for Owned Dwellings in Toronto', 'Year', 'Avg Monthly Shelter Costs', 'blue')),
+        ("shelter_costs_rented", lambda: create_line_chart(census.monthly_avg_costs_by_year['shelter_costs_rented'], 'Average Monthly Shelter Cost for Rented Dwellings in Toronto', 'Year', 'Avg Monthly Shelter Costs', 'orange')),
+        ("average_house_value", lambda: create_line_chart(census.avg_house_value, 'Average House Value in Toronto', 'Year', 'Avg. House Value', 'blue')),
+        ("top_10_expensive_neighbourhoods", lambda: create_bar_chart(census.rankings.top_overall('average_house_value', 10), "Top 10 Expensive Neighbourhoods in Toronto", "Neighbourhood", "Avg. House Value", "blue")),
+        ("average_house_value_by_neighbourhood", lambda: px.bar(census.to_data.loc[:,['neighbourhood', 'average_house_value']].reset_index().astype({'average_house_value': 'int64'}), x="neighbourhood", y="average_house_value", color="average_house_value", facet_row="year", width=1700, height=1200, title="Average House Values in Toronto per Neighbourhood", labels={"neighbourhood": "Neighbourhood", "average_house_value": "Avg. House Value"})),
+        ("neighbourhood_map", lambda: create_map_chart(census)),
+        ("cost_analysis_sunburst", lambda: px.sunburst(census.rankings.top_by_year('shelter_costs_owned', 10), path=['year', 'neighbourhood'], values='shelter_costs_owned', color='shelter_costs_owned',height=800,width=1200, title='Cost Analysis of Most Expensive Neighbourhoods in Toronto per Year')),
+    ]
+    return charts
+
+
+def save_chart(figure, path_stem, chart_formats):
+    # Returns the formats that could not be written
+    skipped = []
+    if isinstance(figure, plt.Figure):
+        for fmt in chart_formats:
+            if fmt == "html":
+                svg = StringIO()
+                figure.savefig(svg, format="svg", bbox_inches="tight")
+                path_stem.with_suffix(".html").write_text(f"<!DOCTYPE html>\n<html><body>\n{svg.getvalue()}\n</body></html>\n")
+            else:
+                figure.savefig(path_stem.with_suffix(f".{fmt}"), format=fmt, bbox_inches="tight")
+        plt.close(figure)
+        return skipped
+    for fmt in chart_formats:
+        if fmt == "html":
+            figure.write_html(path_stem.with_suffix(".html"), include_plotlyjs="cdn")
+            continue
+        try:
+            figure.write_image(path_stem.with_suffix(f".{fmt}"))
+        except (ValueError, ImportError):  # static Plotly export needs kaleido
+            skipped.append(fmt)
+    return skipped
+
+
+def default_coordinates_path(census_path):
+    census_path = Path(census_path)
+    name = census_path.stem.removesuffix("_census_data")
+    return census_path.with_name(f"{name}_coordinates.csv")
+
+
+def export_dataset(census_path, output_dir, chart_formats, coordinates_path=None):
+    start = time.perf_counter()
+    if coordinates_path is None:
+        coordinates_path = default_coordinates_path(census_path)
+    census = get_aggregates(census_path, coordinates_path)
+    timings = [(str(census_path), "load_and_aggregate", time.perf_counter() - start, "")]
+    dataset_dir = Path(output_dir) / Path(census_path).stem
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+    save_dwelling_totals(census.no_of_dwelling_by_year, dataset_dir / "sum_of_dwelling_by_year.csv")
+    for name, build in analysis_charts(census):
+        start = time.perf_counter()
+        skipped = save_chart(build(), dataset_dir / name, chart_formats)
+        timings.append((str(census_path), name, time.perf_counter() - start, " ".join(skipped)))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render every rental analysis chart for a set of census files")
+    parser.add_argument("census_files", nargs="+", type=Path)
+    parser.add_argument("--output-dir", type=Path, default=Path("exports"))
+    parser.add_argument("--formats", nargs="+", choices=formats, default=["png", "html"])
+    parser.add_argument("--coordinates", nargs="+", type=Path, default=None, help="neighbourhood coordinates CSV of each census file, in the same order (default: <name>_coordinates.csv next to each census file)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: one per CPU)")
+    args = parser.parse_args()
+    coordinates = args.coordinates or [None] * len(args.census_files)
+    if len(coordinates) != len(args.census_files):
+        parser.error(f"--coordinates needs one file per census file ({len(args.census_files)}), got {len(coordinates)}")
+    # Workers read the Mapbox token from the environment
+    load_dotenv()
+
+    start = time.perf_counter()
+    timings = []
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = {pool.submit(export_dataset, path, args.output_dir, args.formats, coordinates_path): path for path, coordinates_path in zip(args.census_files, coordinates)}
+        for future in as_completed(futures):
+            try:
+                timings += future.result()
+            except Exception as error:
+                print(f"{futures[future]}: failed: {error}")
+    elapsed = time.perf_counter() - start
+
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    with open(args.output_dir / "timings.csv", "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["dataset", "chart", "seconds", "skipped_formats"])
+        writer.writerows(timings)
+
+    print(f"{'dataset':<40}{'chart':<40}{'seconds':>9}  skipped")
+    for dataset, chart, seconds, skipped in timings:
+        print(f"{Path(dataset).name:<40}{chart:<40}{seconds:>9.3f}  {skipped}")
+    print(f"\n{len(args.census_files)} datasets in {elapsed:.1f}s with {args.workers} workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Cash-flow simulator throughput
+#
+# Times `cash_flow_simulator.simulate` on the bundled neighbourhoods and on synthetic
+# census files (see `generate_census_data.py`) for increasing scenario counts, in-process
+# and on the process pool, and checks that both give identical results.
+#
+# Exits with status 1 if they differ.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/cash_flow_simulator_benchmark.py [--neighbourhoods 1000] [--scenarios 1000 10000] [--workers 4]
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from census_data import load_census_data
+from cash_flow_simulator import SimulationParameters, simulate, simulation_inputs, simulation_executor
+from generate_census_data import generate
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run(label, to_data, scenario_counts, years):
+    failed = False
+    inputs = simulation_inputs(to_data)
+    for scenarios in scenario_counts:
+        params = SimulationParameters(scenarios=scenarios, years=years)
+        inline, inline_seconds = timed(lambda: simulate(inputs, params, parallel=False))
+        pooled, pooled_seconds = timed(lambda: simulate(inputs, params, parallel=True))
+        values = len(inputs) * scenarios * years
+        print(f"{label:<24}{len(inputs):>15}{scenarios:>11}{inline_seconds:>12.2f}{pooled_seconds:>12.2f}{values / inline_seconds / 1e6:>19.1f}")
+        if not inline.equals(pooled):
+            failed = True
+            print("FAIL: in-process and process pool results differ")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the Monte Carlo cash-flow simulator in-process and on a process pool")
+    parser.add_argument("--neighbourhoods", nargs="*", type=int, default=[1000], help="synthetic neighbourhood counts to add to the bundled data")
+    parser.add_argument("--scenarios", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--years", type=int, default=10, help="projection horizon")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="process pool size")
+    args = parser.parse_args()
+    os.environ["SIMULATION_WORKERS"] = str(args.workers)
+
+    # Start the pool up front so its start-up is not counted in the first run
+    simulation_executor().submit(int).result()
+    print(f"{'data':<24}{'neighbourhoods':>15}{'scenarios':>11}{'inline (s)':>12}{'pool (s)':>12}{'inline M values/s':>19}")
+    failed = run("bundled", load_census_data(), args.scenarios, args.years)
+    with tempfile.TemporaryDirectory() as data_dir:
+        for neighbourhoods in args.neighbourhoods:
+            census_path = Path(data_dir) / "census.csv"
+            generate(census_path, Path(data_dir) / "coordinates.csv", neighbourhoods, 4)
+            failed |= run("synthetic", load_census_data(census_path), args.scenarios, args.years)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
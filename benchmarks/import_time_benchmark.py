@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Cold-start import time
+#
+# Imports each entry point in a fresh interpreter with `python -X importtime` and reports
+# the wall-clock time of the process, the total import time and the slowest top-level
+# imports:
+#
+# - data: the data and aggregation modules used by batch jobs and health checks
+# - analysis: the headless chart export (`batch_export.py`), matplotlib and Plotly only
+# - dashboard: `dashboard.py` up to the point where a session's first tab is built
+#
+# The data path must not import any plotting library and the analysis path must not import
+# Panel, HoloViews or Bokeh; the script exits with status 1 if one does. Plotting libraries
+# the dashboard imports are listed too, since its panes load them on first use.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/import_time_benchmark.py [--repeat 5] [--top 5]
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+paths = {
+    "data": "import census_data, aggregates, streaming_aggregates, investment_metrics, spatial_index, level_of_detail, cash_flow_simulator, data_validation, temporal_interpolation",
+    "analysis": "import batch_export",
+    "dashboard": "import dashboard",
+}
+# Libraries a path must not import
+forbidden = {
+    "data": ["panel", "bokeh", "holoviews", "hvplot", "plotly", "matplotlib"],
+    "analysis": ["panel", "bokeh", "holoviews", "hvplot"],
+    "dashboard": [],
+}
+plotting_libraries = ["panel", "bokeh", "holoviews", "hvplot", "plotly", "matplotlib"]
+
+report_loaded = f"import json, sys; print(json.dumps([name for name in {plotting_libraries!r} if name in sys.modules]))"
+
+
+def import_times(stderr):
+    # Total import time and {package: cumulative microseconds} for every top-level package
+    # outside the repository, wherever it was first imported, from -X importtime output
+    total, packages = 0, {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  "):
+            total += int(cumulative)
+        name = name.strip()
+        if "." not in name and not (REPO_ROOT / f"{name}.py").exists():
+            packages[name] = int(cumulative)
+    return total, packages
+
+
+def run(statement):
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"{statement}; {report_loaded}"], cwd=REPO_ROOT,
+                             capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    loaded = json.loads(process.stdout.strip().splitlines()[-1])
+    return (wall, *import_times(process.stderr), loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time of the data, analysis and dashboard entry points")
+    parser.add_argument("--paths", nargs="+", choices=list(paths), default=list(paths))
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per path")
+    parser.add_argument("--top", type=int, default=5, help="slowest packages to list")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'path':<11}{'process (s)':>12}{'imports (s)':>12}  slowest packages")
+    for path in args.paths:
+        walls, totals, package_times = [], [], {}
+        for _ in range(args.repeat):
+            wall, total, packages, loaded = run(paths[path])
+            walls.append(wall)
+            totals.append(total / 1e6)
+            for name, microseconds in packages.items():
+                package_times.setdefault(name, []).append(microseconds)
+        top = sorted(package_times.items(), key=lambda item: -statistics.median(item[1]))[:args.top]
+        print(f"{path:<11}{statistics.median(walls):>12.2f}{statistics.median(totals):>12.2f}  "
+              + ", ".join(f"{name} {statistics.median(times) / 1e6:.2f}s" for name, times in top))
+        if loaded:
+            print(f"{'':<35}plotting libraries imported: {', '.join(loaded)}")
+        unexpected = [name for name in loaded if name in forbidden[path]]
+        if unexpected:
+            failed = True
+            print(f"FAIL: the {path} path imports {', '.join(unexpected)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
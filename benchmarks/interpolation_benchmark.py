@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Yearly estimates: vectorized vs per-neighbourhood fits
+#
+# Times `temporal_interpolation.AnnualEstimates.from_frame` with both interpolation
+# methods on synthetic census files (see `generate_census_data.py`) against fitting every
+# neighbourhood and column separately: `np.interp` for the linear method and, when scipy
+# is installed, `scipy.interpolate.PchipInterpolator` for PCHIP. The per-neighbourhood
+# version is only run up to --reference-neighbourhoods neighbourhoods. It also checks that
+# the estimates go through the census values and that PCHIP estimates stay between the
+# census values on either side.
+#
+# Exits with status 1 if any check fails.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/interpolation_benchmark.py [--neighbourhoods 1000 10000 100000] [--years 4]
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from census_data import load_census_data
+from generate_census_data import generate
+from temporal_interpolation import AnnualEstimates, census_grid, interpolation_columns, interpolation_methods
+
+try:
+    from scipy.interpolate import PchipInterpolator
+except ImportError:
+    PchipInterpolator = None
+
+
+def per_neighbourhood_fit(census_years, grid, years, method):
+    values = np.empty((grid.shape[0], len(years), grid.shape[2]))
+    for row in range(grid.shape[0]):
+        for column in range(grid.shape[2]):
+            if method == 'linear':
+                values[row, :, column] = np.interp(years, census_years, grid[row, :, column])
+            else:
+                values[row, :, column] = PchipInterpolator(census_years, grid[row, :, column])(years)
+    return values
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def check(estimates, census_years, grid, method):
+    # Returns the failed checks of one set of estimates
+    failures = []
+    at_census_years = estimates.values[:, np.searchsorted(estimates.years, census_years)]
+    if not np.allclose(at_census_years, grid, rtol=1e-9):
+        failures.append("estimates differ from the census values in census years")
+    if method == 'pchip':
+        segment = np.clip(np.searchsorted(census_years, estimates.years, side='right') - 1, 0, len(census_years) - 2)
+        low = np.minimum(grid[:, segment], grid[:, segment + 1])
+        high = np.maximum(grid[:, segment], grid[:, segment + 1])
+        tolerance = 1e-9 * np.abs(high)
+        if ((estimates.values < low - tolerance) | (estimates.values > high + tolerance)).any():
+            failures.append("PCHIP estimates overshoot the census values")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vectorized and per-neighbourhood yearly estimates on synthetic census files")
+    parser.add_argument("--neighbourhoods", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--years", type=int, default=4, help="census years per neighbourhood")
+    parser.add_argument("--reference-neighbourhoods", type=int, default=10000, help="largest input the per-neighbourhood version is run on")
+    args = parser.parse_args()
+
+    if PchipInterpolator is None:
+        print("scipy is not installed, PCHIP estimates are not compared with a per-neighbourhood fit")
+    failed = False
+    print(f"{'neighbourhoods':>15}{'method':>8}{'estimates':>11}{'vectorized (ms)':>17}{'per-neighbourhood (ms)':>24}{'speed-up':>10}")
+    with tempfile.TemporaryDirectory() as data_dir:
+        for neighbourhoods in args.neighbourhoods:
+            census_path = Path(data_dir) / "census.csv"
+            generate(census_path, Path(data_dir) / "coordinates.csv", neighbourhoods, args.years)
+            to_data = load_census_data(census_path)
+            _, census_years, grid = census_grid(to_data, interpolation_columns)
+            for method in interpolation_methods:
+                estimates, seconds = timed(lambda: AnnualEstimates.from_frame(to_data, method=method))
+                label = f"{neighbourhoods:>15}{method:>8}{estimates.values.size:>11}{seconds * 1000:>17.1f}"
+                for failure in check(estimates, census_years, grid, method):
+                    failed = True
+                    print(f"FAIL: {failure}")
+                if neighbourhoods > args.reference_neighbourhoods or (method == 'pchip' and PchipInterpolator is None):
+                    print(f"{label}{'-':>24}{'-':>10}")
+                    continue
+                reference, reference_seconds = timed(lambda: per_neighbourhood_fit(census_years, grid, estimates.years, method))
+                print(f"{label}{reference_seconds * 1000:>24.0f}{reference_seconds / seconds:>9.0f}x")
+                if not np.allclose(estimates.values, reference, rtol=1e-9):
+                    failed = True
+                    print("FAIL: vectorized and per-neighbourhood estimates differ")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Investment metrics: vectorized vs row-wise
+#
+# Times `investment_metrics.investment_metrics` on synthetic census files (see
+# `generate_census_data.py`) against a straightforward pandas version using row-wise
+# `apply` and a per-neighbourhood groupby for the growth rates, and checks that both give
+# the same numbers. The row-wise version is only run up to --reference-rows rows.
+#
+# Exits with status 1 if the results differ.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/investment_metrics_benchmark.py [--neighbourhoods 1000 10000 100000] [--years 8]
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from census_data import load_census_data
+from generate_census_data import generate
+from investment_metrics import investment_metrics, metric_columns
+
+
+def ratio(numerator, denominator):
+    return numerator / denominator if denominator > 0 else np.nan
+
+
+def row_wise_metrics(to_data):
+    rows = to_data.reset_index().astype({'year': float, 'average_house_value': float})
+    rows['price_to_rent'] = rows.apply(lambda row: ratio(row['average_house_value'], 12 * float(row['shelter_costs_rented'])), axis=1)
+    rows['gross_yield_pct'] = rows.apply(lambda row: ratio(12 * float(row['shelter_costs_rented']), row['average_house_value']) * 100, axis=1)
+    rows['owned_rented_spread'] = rows.apply(lambda row: float(row['shelter_costs_owned']) - float(row['shelter_costs_rented']), axis=1)
+
+    def growth(group):
+        group = group.sort_values('year')
+        previous_value = group['average_house_value'].shift().where(lambda value: value > 0)
+        rate = (group['average_house_value'] / previous_value) ** (1 / group['year'].diff()) - 1
+        return rate * 100
+
+    rows['value_cagr_pct'] = rows.groupby('neighbourhood', observed=True, group_keys=False)[['year', 'average_house_value']].apply(growth)
+    return rows.set_index('year')
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vectorized and row-wise investment metrics on synthetic census files")
+    parser.add_argument("--neighbourhoods", nargs="+", type=int, default=[1000, 10000, 100000])
+    parser.add_argument("--years", type=int, default=8)
+    parser.add_argument("--reference-rows", type=int, default=100_000, help="largest input the row-wise version is run on")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'rows':>10}{'vectorized (ms)':>17}{'row-wise (ms)':>15}{'speed-up':>10}")
+    with tempfile.TemporaryDirectory() as data_dir:
+        for neighbourhoods in args.neighbourhoods:
+            census_path = Path(data_dir) / "census.csv"
+            generate(census_path, Path(data_dir) / "coordinates.csv", neighbourhoods, args.years)
+            to_data = load_census_data(census_path)
+            metrics, seconds = timed(lambda: investment_metrics(to_data))
+            if len(to_data) > args.reference_rows:
+                print(f"{len(to_data):>10}{seconds * 1000:>17.1f}{'-':>15}{'-':>10}")
+                continue
+            reference, reference_seconds = timed(lambda: row_wise_metrics(to_data))
+            print(f"{len(to_data):>10}{seconds * 1000:>17.1f}{reference_seconds * 1000:>15.0f}{reference_seconds / seconds:>9.0f}x")
+            if not np.allclose(metrics[metric_columns].to_numpy(), reference[metric_columns].to_numpy(), rtol=1e-12, equal_nan=True):
+                failed = True
+                print("FAIL: vectorized and row-wise metrics differ")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Full-detail vs level-of-detail map and facet bar
+#
+# Generates synthetic census files with 1k and 10k neighbourhoods (see
+# `generate_census_data.py`) and builds `neighbourhood_map()` and
+# `average_house_value_snapshot()` from the dashboard with the level-of-detail mode off
+# (every neighbourhood drawn) and on. For each figure it reports the build time, the
+# number of traces and markers, the size of the figure JSON sent to the browser, and, when
+# `node` is on the PATH, how long the browser-side `JSON.parse` of that payload takes.
+# Plotly.js drawing time is not measured, as that needs a browser; trace and marker counts
+# are what drive it.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/level_of_detail_benchmark.py [--neighbourhoods 1000 10000] [--years 4]
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from generate_census_data import generate
+
+# Runs inside the child interpreter with the dashboard pointed at a synthetic dataset
+FIGURE_SCRIPT = '''
+import inspect, json, runpy, sys, time
+output_dir = sys.argv[1]
+dashboard = runpy.run_path("dashboard.py", run_name="benchmark_dashboard")
+figures = [("map", "neighbourhood_map", ())]
+if dashboard["level_of_detail"]:
+    figures.append(("map, zoom 14", "neighbourhood_map", (14,)))
+figures.append(("facet bar", "average_house_value_snapshot", ()))
+for label, name, args in figures:
+    build = inspect.unwrap(dashboard[name])
+    start = time.perf_counter()
+    figure_json = build(*args).to_json()
+    seconds = time.perf_counter() - start
+    data = json.loads(figure_json)["data"]
+    path = f"{output_dir}/{name}{args}.json"
+    with open(path, "w") as f:
+        f.write(figure_json)
+    markers = sum(len(trace.get("lat") or trace.get("x") or []) for trace in data)
+    print(json.dumps({"figure": label, "seconds": seconds, "traces": len(data), "markers": markers, "bytes": len(figure_json), "path": path}), flush=True)
+'''
+
+NODE_PARSE = '''
+const fs = require("fs");
+const text = fs.readFileSync(process.argv[1], "utf8");
+const start = process.hrtime.bigint();
+JSON.parse(text);
+console.log(Number(process.hrtime.bigint() - start) / 1e9);
+'''
+
+
+def node_parse_seconds(path):
+    if shutil.which("node") is None:
+        return None
+    result = subprocess.run(["node", "-e", NODE_PARSE, path], capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full-detail and level-of-detail figures on synthetic census files")
+    parser.add_argument("--neighbourhoods", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--years", type=int, default=4)
+    parser.add_argument("--threshold", type=int, default=500, help="DASHBOARD_LOD_THRESHOLD for the level-of-detail runs")
+    args = parser.parse_args()
+
+    print(f"{'neighbourhoods':>14}{'mode':>7}  {'figure':<14}{'build (s)':>10}{'traces':>8}{'markers':>9}{'JSON (KB)':>11}{'parse (ms)':>12}")
+    with tempfile.TemporaryDirectory() as data_dir:
+        data_dir = Path(data_dir)
+        for neighbourhoods in args.neighbourhoods:
+            census_path, coordinates_path = data_dir / f"census_{neighbourhoods}.csv", data_dir / f"coordinates_{neighbourhoods}.csv"
+            generate(census_path, coordinates_path, neighbourhoods, args.years)
+            for mode, threshold in (("full", sys.maxsize), ("lod", args.threshold)):
+                output_dir = data_dir / f"{neighbourhoods}_{mode}"
+                output_dir.mkdir()
+                env = dict(os.environ, CENSUS_DATA_PATH=str(census_path), COORDINATES_PATH=str(coordinates_path),
+                           DASHBOARD_LOD_THRESHOLD=str(threshold))
+                result = subprocess.run([sys.executable, "-c", FIGURE_SCRIPT, str(output_dir)], cwd=REPO_ROOT, env=env,
+                                        capture_output=True, text=True, check=True)
+                for line in result.stdout.splitlines():
+                    if not line.startswith('{"figure"'):
+                        continue
+                    stats = json.loads(line)
+                    parse = node_parse_seconds(stats["path"])
+                    parse = f"{parse * 1000:>12.1f}" if parse is not None else f"{'-':>12}"
+                    print(f"{neighbourhoods:>14}{mode:>7}  {stats['figure']:<14}{stats['seconds']:>10.2f}{stats['traces']:>8}{stats['markers']:>9}{stats['bytes'] / 1024:>11.0f}{parse}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Census data load benchmark
+#
+# Compares loading the census CSV with `pd.read_csv` against loading the memory-mapped
+# Feather cache written by `python census_data.py`. Each load runs in a fresh interpreter
+# and reports wall time and the growth in peak RSS caused by the load.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/load_benchmark.py [--census PATH] [--repeat 5]
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from census_data import CENSUS_DATA_PATH, build_columnar_cache, census_dtypes
+
+# Runs inside the child interpreter; pandas and pyarrow are imported before measuring
+LOAD_SCRIPT = '''
+import json, resource, sys, time
+import pandas as pd
+import census_data
+source, path = sys.argv[1], sys.argv[2]
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if source == "csv":
+    df = pd.read_csv(path, index_col="year")
+else:
+    df = census_data.load_census_data(path)
+elapsed = time.perf_counter() - start
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": elapsed, "rss_mb": (rss_after - rss_before) / 1024, "rows": len(df)}))
+'''
+
+
+def run_load(source, path):
+    result = subprocess.run([sys.executable, "-c", LOAD_SCRIPT, source, str(path)], cwd=REPO_ROOT,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare census load time and RSS from the CSV and the Feather cache")
+    parser.add_argument("--census", default=CENSUS_DATA_PATH, help="census CSV to load")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh processes per source")
+    args = parser.parse_args()
+
+    build_columnar_cache(args.census, census_dtypes)
+
+    print(f"{'source':<10}{'rows':>10}{'load (s)':>12}{'peak RSS growth (MB)':>24}")
+    for source in ("csv", "feather"):
+        runs = [run_load(source, args.census) for _ in range(args.repeat)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        rss_mb = statistics.median(run["rss_mb"] for run in runs)
+        print(f"{source:<10}{runs[0]['rows']:>10}{seconds:>12.4f}{rss_mb:>24.1f}")
+
+
+if __name__ == "__main__":
+    main()
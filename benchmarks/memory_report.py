@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Census table memory report
+#
+# Shows the in-memory size of `to_data` per row, column by column, when loaded with
+# pandas' default dtypes and with the compact schema in `census_data.census_dtypes`.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/memory_report.py [--census PATH]
+
+import argparse
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from census_data import CENSUS_DATA_PATH, load_census_data
+
+
+def bytes_per_row(df):
+    usage = df.reset_index().memory_usage(index=False, deep=True)
+    return usage / len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show census table memory per row with default and compact dtypes")
+    parser.add_argument("--census", default=CENSUS_DATA_PATH, help="census CSV to measure")
+    args = parser.parse_args()
+
+    before = bytes_per_row(pd.read_csv(args.census, index_col="year"))
+    after = bytes_per_row(load_census_data(args.census))
+
+    print(f"{'column':<30}{'default (B/row)':>18}{'schema (B/row)':>17}")
+    for column in before.index:
+        print(f"{column:<30}{before[column]:>18.1f}{after[column]:>17.1f}")
+    print(f"{'total':<30}{before.sum():>18.1f}{after.sum():>17.1f}")
+    print(f"\n{before.sum() / after.sum():.1f}x smaller with the compact schema")
+
+
+if __name__ == "__main__":
+    main()
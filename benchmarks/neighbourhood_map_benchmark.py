@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # neighbourhood_map() repeated-call check
+#
+# Calls `neighbourhood_map()` from a freshly run dashboard script thousands of times (served
+# from the figure cache) and builds it from scratch a number of times, then checks that:
+#
+# - the shared location table and census aggregates are unchanged
+# - repeated calls return the same figure
+# - latency is stable: the p99 call is within --max-ratio of the median
+#
+# Exits with status 1 if any check fails.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/neighbourhood_map_benchmark.py [--calls 5000] [--builds 50]
+
+import argparse
+import inspect
+import os
+import runpy
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def fingerprint(df):
+    return (tuple(df.columns), df.index.name, int(pd.util.hash_pandas_object(df).sum()))
+
+
+def timings(fn, calls):
+    results = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        results.append(time.perf_counter() - start)
+    return results
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that repeated neighbourhood_map() calls are fast, identical and leave shared data unchanged")
+    parser.add_argument("--calls", type=int, default=5000, help="cached calls")
+    parser.add_argument("--builds", type=int, default=50, help="uncached figure builds")
+    parser.add_argument("--max-ratio", type=float, default=5.0, help="allowed p99 / median latency")
+    args = parser.parse_args()
+
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, str(REPO_ROOT))
+    dashboard = runpy.run_path("dashboard.py", run_name="benchmark")
+    census = dashboard["census"]
+    neighbourhood_map = dashboard["neighbourhood_map"]
+    shared = {
+        "locations": census.locations,
+        "neighbourhood_value_locations": census.neighbourhood_value_locations,
+        "neighbourhoods_value_avg": census.neighbourhoods_value_avg,
+    }
+    before = {name: fingerprint(df) for name, df in shared.items()}
+    first = neighbourhood_map()
+
+    # Skip the instrumentation and figure cache wrappers to time the build itself
+    uncached_map = inspect.unwrap(neighbourhood_map)
+    failures = []
+    for label, fn, calls in (("cached", neighbourhood_map, args.calls), ("uncached", uncached_map, args.builds)):
+        results = timings(fn, calls)
+        median, p99 = statistics.median(results), percentile(results, 0.99)
+        print(f"{label:<10}{calls:>7} calls  median {median * 1000:8.3f} ms  p99 {p99 * 1000:8.3f} ms")
+        if p99 > args.max_ratio * median:
+            failures.append(f"{label} p99 latency is {p99 / median:.1f}x the median")
+
+    if neighbourhood_map() != first:
+        failures.append("repeated calls returned different figures")
+    for name, df in shared.items():
+        if df is not getattr(census, name) or fingerprint(df) != before[name]:
+            failures.append(f"census.{name} was modified")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Neighbourhood widget benchmark
+#
+# Measures the initial payload (serialized Bokeh document) and the latency of changing
+# the neighbourhood dropdown for the "Average House Value by Neighbourhood" pane:
+#
+# - holomap:  hvplot groupby='neighbourhood' with dynamic=False, every neighbourhood up front
+# - dynamic:  hvplot groupby='neighbourhood' (the previous dashboard code), filters per change
+# - indexed:  dashboard.average_value_by_neighbourhood(), slices the row-offset index
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/neighbourhood_widget_benchmark.py [--changes 20]
+
+import argparse
+import os
+import runpy
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import hvplot.pandas
+import panel as pn
+from bokeh.core.json_encoder import serialize_json
+from bokeh.document import Document
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def payload_bytes(doc):
+    return len(serialize_json(doc.to_json()))
+
+
+def measure(layout, select, neighbourhoods):
+    doc = Document()
+    doc.add_root(layout.get_root(doc))
+    size = payload_bytes(doc)
+    timings = []
+    for neighbourhood in neighbourhoods:
+        start = time.perf_counter()
+        select.value = neighbourhood
+        timings.append(time.perf_counter() - start)
+    return size, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the neighbourhood pane payload and dropdown change latency")
+    parser.add_argument("--changes", type=int, default=20, help="dropdown changes to time")
+    args = parser.parse_args()
+
+    os.chdir(REPO_ROOT)
+    sys.path.insert(0, str(REPO_ROOT))
+    dashboard = runpy.run_path("dashboard.py", run_name="benchmark")
+    to_data = dashboard["to_data"]
+    neighbourhoods = list(dashboard["census"].neighbourhood_rows)[1:args.changes + 1]
+    avg_house_value_by_neighbourhood = to_data.loc[:,['neighbourhood','average_house_value']]
+
+    layouts = {}
+    for mode, dynamic in (("holomap", False), ("dynamic", True)):
+        plot = avg_house_value_by_neighbourhood.hvplot.line(groupby='neighbourhood', dynamic=dynamic, xlabel="Year", ylabel="Avg. House Value", yformatter='$%.2f')
+        layout = pn.panel(plot)
+        layouts[mode] = (layout, layout[1][0])
+    indexed = dashboard["average_value_by_neighbourhood"]()
+    layouts["indexed"] = (indexed, indexed[1][0])
+
+    print(f"{'mode':<10}{'payload (KB)':>14}{'change p50 (ms)':>18}{'change max (ms)':>18}")
+    for mode, (layout, select) in layouts.items():
+        size, timings = measure(layout, select, neighbourhoods)
+        print(f"{mode:<10}{size / 1024:>14.1f}{statistics.median(timings) * 1000:>18.2f}{max(timings) * 1000:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
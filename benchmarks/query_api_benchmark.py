@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Query API latency
+#
+# Starts `query_api.py` on the bundled data, or on synthetic census files with
+# --neighbourhoods (see `generate_census_data.py`), and times a few typical queries over
+# one keep-alive connection:
+#
+# - first: the first request, which looks rows up and serializes the response
+# - repeat: the same request again, served from the response cache
+# - conditional: the same request with If-None-Match, answered 304 Not Modified
+#
+# Exits with status 1 if a conditional request is not answered 304 or the JSON and Arrow
+# responses of a query have different row counts.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/query_api_benchmark.py [--neighbourhoods 10000] [--repeat 200]
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+from pathlib import Path
+
+import pyarrow as pa
+
+from serve_load_test import free_port, wait_until_ready
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from generate_census_data import generate
+
+
+def request(connection, path, headers=None):
+    start = time.perf_counter()
+    connection.request("GET", path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    return response, body, time.perf_counter() - start
+
+
+def sample_queries(index):
+    year, neighbourhood = index["years"][-1], index["neighbourhoods"][0]
+    return [
+        ("dwellings", {}),
+        ("shelter-costs", {"year": year}),
+        ("house-values", {"neighbourhood": neighbourhood}),
+        ("census", {"year": year}),
+        ("census", {"neighbourhood": neighbourhood, "dwelling_type": "duplex"}),
+        ("investment-metrics", {"year": year}),
+    ]
+
+
+def run(port, repeat):
+    failed = False
+    connection = http.client.HTTPConnection("localhost", port)
+    index = json.loads(request(connection, "/api")[1])
+    print(f"{'query':<58}{'rows':>8}{'bytes':>11}{'first (ms)':>12}{'repeat (ms)':>13}{'conditional (ms)':>18}")
+    for endpoint, filters in sample_queries(index):
+        path = f"/api/{endpoint}?{urllib.parse.urlencode(filters)}".rstrip("?")
+        response, body, first = request(connection, path)
+        etag = response.getheader("ETag")
+        repeats = [request(connection, path)[2] for _ in range(repeat)]
+        conditionals, statuses = [], set()
+        for _ in range(repeat):
+            response, _, seconds = request(connection, path, {"If-None-Match": etag})
+            conditionals.append(seconds)
+            statuses.add(response.status)
+        if statuses != {304}:
+            failed = True
+            print(f"FAIL: conditional requests for {path} were answered {sorted(statuses)}")
+        rows = len(json.loads(body))
+        arrow_rows = pa.ipc.open_stream(request(connection, path, {"Accept": "application/vnd.apache.arrow.stream"})[1]).read_all().num_rows
+        if arrow_rows != rows:
+            failed = True
+            print(f"FAIL: {path} returned {rows} JSON rows and {arrow_rows} Arrow rows")
+        print(f"{path[:57]:<58}{rows:>8}{len(body):>11}{first * 1000:>12.2f}"
+              f"{statistics.median(repeats) * 1000:>13.2f}{statistics.median(conditionals) * 1000:>18.2f}")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency of first, repeated and conditional query API requests")
+    parser.add_argument("--neighbourhoods", type=int, default=None, help="serve synthetic data with this many neighbourhoods")
+    parser.add_argument("--years", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=200, help="repeated and conditional requests per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = dict(os.environ)
+        if args.neighbourhoods:
+            census_path, coordinates_path = Path(data_dir) / "census.csv", Path(data_dir) / "coordinates.csv"
+            generate(census_path, coordinates_path, args.neighbourhoods, args.years)
+            env.update(CENSUS_DATA_PATH=str(census_path), COORDINATES_PATH=str(coordinates_path))
+        port = free_port()
+        server = subprocess.Popen([sys.executable, "query_api.py", "--port", str(port)], cwd=REPO_ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        try:
+            wait_until_ready(f"http://localhost:{port}/api")
+            failed = run(port, args.repeat)
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Multi-process serving load test
+#
+# Starts `serve.py` with an increasing number of workers and opens dashboard sessions
+# against it from concurrent clients. Every page request creates a Bokeh session and runs
+# `dashboard.py`, so completed requests per second is the session throughput. After each
+# run the resident (RSS) and proportional (PSS, shared pages split between processes)
+# memory of every worker is reported.
+#
+# Requires psutil. Usage (from the repository root):
+#
+#     python benchmarks/serve_load_test.py --workers 1 2 4 --clients 8 --duration 30
+
+import argparse
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import psutil
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        return sock.getsockname()[1]
+
+
+def open_session(url):
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=120) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def wait_until_ready(url, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return open_session(url)
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"server at {url} did not start within {timeout}s")
+
+
+def run_clients(url, clients, duration):
+    deadline = time.monotonic() + duration
+
+    def client():
+        latencies = []
+        while time.monotonic() < deadline:
+            latencies.append(open_session(url))
+        return latencies
+
+    with ThreadPoolExecutor(clients) as pool:
+        results = list(pool.map(lambda _: client(), range(clients)))
+    return [latency for latencies in results for latency in latencies]
+
+
+def worker_memory(server):
+    # With a single worker the server does not fork and serves from its own process
+    parent = psutil.Process(server.pid)
+    memory = []
+    for worker in parent.children(recursive=True) or [parent]:
+        info = worker.memory_full_info()
+        memory.append((info.rss / 2**20, getattr(info, "pss", info.rss) / 2**20))
+    return memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure dashboard sessions per second and worker memory as serve.py workers increase")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker counts to test")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load per worker count")
+    args = parser.parse_args()
+
+    print(f"{'workers':>7}{'sessions':>10}{'sessions/s':>12}{'p50 (s)':>10}{'p99 (s)':>10}{'RSS/worker (MB)':>17}{'PSS/worker (MB)':>17}")
+    for workers in args.workers:
+        port = free_port()
+        url = f"http://localhost:{port}/dashboard"
+        server = subprocess.Popen([sys.executable, "serve.py", "--workers", str(workers), "--port", str(port)],
+                                  cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        try:
+            wait_until_ready(url)
+            # Warm every worker's per-process caches before measuring
+            run_clients(url, workers * 2, 5)
+            start = time.perf_counter()
+            latencies = run_clients(url, args.clients, args.duration)
+            elapsed = time.perf_counter() - start
+            memory = worker_memory(server)
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+        rss = statistics.mean(rss for rss, _ in memory)
+        pss = statistics.mean(pss for _, pss in memory)
+        print(f"{workers:>7}{len(latencies):>10}{len(latencies) / elapsed:>12.2f}{statistics.median(latencies):>10.3f}{p99:>10.3f}{rss:>17.1f}{pss:>17.1f}")
+
+
+if __name__ == "__main__":
+    main()
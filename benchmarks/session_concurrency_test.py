@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Session latency under concurrent session opens
+#
+# Starts `serve.py` with one worker, with pane builders run inline on the event loop
+# (DASHBOARD_ASYNC_PANES=0) and in the pane executor (the default), and opens bursts of
+# 1, 2, 4, 8... simultaneous sessions against each. For every burst size it reports:
+#
+# - session open latency: time to get the page back (the session is created and its
+#   first tab laid out, with placeholders for panes still being built in async mode)
+# - event loop stall: latency of /metrics.json requests made every 20 ms during the
+#   burst, which only wait for whatever is running on the event loop
+# - time until every pane of the burst has been built, from the pane build counters
+#
+# The figure cache is disabled by default so every session builds its figures; pass
+# --figure-cache to keep it. --eager builds every tab up front instead of the first one.
+#
+# Exits with status 1 if, for any burst size, in async mode:
+#
+# - the p99 event loop stall is more than --max-stall-ratio (default 0.75) times the
+#   inline one, i.e. pane builds block the event loop again. The ratio is used rather
+#   than a fixed limit because stalls still grow with the burst size on few CPUs, where
+#   the pane threads compete for the GIL.
+# - the p99 session open latency of a larger burst is more than --max-open-growth
+#   (default 2) times the burst size times the median open latency per session of the
+#   smallest burst (a single open by default). Sessions are created one at a time on the
+#   worker's event loop, so the last of N simultaneous opens waits for N session
+#   creations however fast the panes are; the open latency has to stay flat beyond that,
+#   which fails if pane builds or their conversion to Bokeh models hold up session
+#   creation.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/session_concurrency_test.py [--sessions 1 2 4 8] [--rounds 3]
+
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from serve_load_test import free_port, open_session, wait_until_ready
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def pane_builds(base_url):
+    with urllib.request.urlopen(f"{base_url}/metrics.json", timeout=120) as response:
+        panes = json.load(response)["panes"]
+    return sum(metrics["calls"] for metrics in panes.values())
+
+
+def wait_for_builds(base_url, target, timeout=600):
+    deadline = time.monotonic() + timeout
+    while pane_builds(base_url) < target:
+        if time.monotonic() > deadline:
+            raise RuntimeError("panes were not built in time")
+        time.sleep(0.05)
+
+
+def settled_builds(base_url, quiet=2):
+    # The pane build count once it has not changed for `quiet` seconds
+    builds, stable_since = pane_builds(base_url), time.monotonic()
+    while time.monotonic() - stable_since < quiet:
+        time.sleep(0.1)
+        current = pane_builds(base_url)
+        if current != builds:
+            builds, stable_since = current, time.monotonic()
+    return builds
+
+
+def builds_per_session(base_url, url):
+    # Pane builds caused by opening one session, once earlier builds have finished
+    before = settled_builds(base_url)
+    open_session(url)
+    return settled_builds(base_url) - before
+
+
+def probe(base_url, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        with urllib.request.urlopen(f"{base_url}/metrics.json", timeout=120) as response:
+            response.read()
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.02)
+
+
+def burst(base_url, url, sessions, per_session):
+    before = pane_builds(base_url)
+    stop, probe_latencies = threading.Event(), []
+    prober = threading.Thread(target=probe, args=(base_url, stop, probe_latencies))
+    start = time.perf_counter()
+    prober.start()
+    with ThreadPoolExecutor(sessions) as pool:
+        latencies = list(pool.map(lambda _: open_session(url), range(sessions)))
+    wait_for_builds(base_url, before + sessions * per_session)
+    ready = time.perf_counter() - start
+    stop.set()
+    prober.join()
+    return latencies, probe_latencies, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session latency as simultaneous session opens increase")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8], help="simultaneous session opens per burst")
+    parser.add_argument("--rounds", type=int, default=3, help="bursts per size")
+    parser.add_argument("--figure-cache", action="store_true", help="keep the figure cache enabled")
+    parser.add_argument("--eager", action="store_true", help="build every tab when a session opens")
+    parser.add_argument("--max-stall-ratio", type=float, default=0.75, help="allowed async / inline p99 event loop stall")
+    parser.add_argument("--max-open-growth", type=float, default=2.0, help="allowed async p99 open latency / (burst size x median open latency per session of the smallest burst)")
+    args = parser.parse_args()
+
+    # (mode, sessions) -> p99 event loop stall, median and p99 open latency
+    stall_p99, open_p50, open_p99 = {}, {}, {}
+
+    print(f"{'mode':<7}{'sessions':>9}{'open p50 (s)':>14}{'open p99 (s)':>14}{'stall p99 (s)':>15}{'all built (s)':>15}")
+    for mode, async_panes in (("inline", "0"), ("async", "1")):
+        port = free_port()
+        base_url = f"http://localhost:{port}"
+        url = f"{base_url}/dashboard"
+        env = dict(os.environ, DASHBOARD_ASYNC_PANES=async_panes, DASHBOARD_LAZY_TABS="0" if args.eager else "1")
+        if not args.figure_cache:
+            env["DASHBOARD_FIGURE_CACHE_MB"] = "0"
+        server = subprocess.Popen([sys.executable, "serve.py", "--workers", "1", "--port", str(port)], cwd=REPO_ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        try:
+            wait_until_ready(url)
+            per_session = builds_per_session(base_url, url)
+            for sessions in args.sessions:
+                opens, stalls, ready = [], [], []
+                for _ in range(args.rounds):
+                    latencies, probe_latencies, seconds = burst(base_url, url, sessions, per_session)
+                    opens += latencies
+                    stalls += probe_latencies
+                    ready.append(seconds)
+                stall_p99[mode, sessions] = percentile(stalls, 0.99)
+                open_p50[mode, sessions], open_p99[mode, sessions] = statistics.median(opens), percentile(opens, 0.99)
+                print(f"{mode:<7}{sessions:>9}{open_p50[mode, sessions]:>14.3f}{open_p99[mode, sessions]:>14.3f}"
+                      f"{stall_p99[mode, sessions]:>15.3f}{statistics.median(ready):>15.2f}")
+        finally:
+            os.killpg(server.pid, signal.SIGTERM)
+            server.wait()
+
+    failed = False
+    for sessions in args.sessions:
+        ratio = stall_p99["async", sessions] / stall_p99["inline", sessions]
+        if ratio > args.max_stall_ratio:
+            failed = True
+            print(f"FAIL: with {sessions} simultaneous sessions the async event loop stall is {ratio:.2f}x the inline one")
+    smallest = min(args.sessions)
+    single = open_p50["async", smallest] / smallest
+    for sessions in args.sessions:
+        if sessions == smallest:
+            continue
+        growth = open_p99["async", sessions] / (sessions * single)
+        if growth > args.max_open_growth:
+            failed = True
+            print(f"FAIL: with {sessions} simultaneous sessions the async p99 open latency is {growth:.2f}x {sessions} single opens")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Spatial index query latency
+#
+# Builds `spatial_index.SpatialIndex` over the bundled neighbourhood coordinates and over
+# synthetic point sets scattered around them, runs random radius, k-nearest and
+# bounding-box queries, and checks every answer against a brute-force scan. Reports build
+# time, median / p99 query latency and the mean number of rows returned.
+#
+# Exits with status 1 if an answer differs from the brute-force scan or a median query
+# takes longer than --max-ms. Query kinds returning more than 1000 rows on average (wide
+# radii over a million points) only copy out their answer, so they are reported but not
+# held to --max-ms.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/spatial_index_benchmark.py [--points 10000 1000000] [--queries 2000]
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from census_data import COORDINATES_PATH
+from spatial_index import SpatialIndex, haversine_km
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run_queries(index, lat, lon, queries, rng, check):
+    # Latencies and result sizes per query kind, and the number of answers that differ
+    # from a full scan
+    latencies = {"radius": [], "nearest": [], "bbox": []}
+    sizes = {kind: [] for kind in latencies}
+    wrong = 0
+    for _ in range(queries):
+        centre = rng.integers(len(lat))
+        q_lat, q_lon = lat[centre] + rng.normal(0, 0.01), lon[centre] + rng.normal(0, 0.01)
+        km, k, half = rng.uniform(0.5, 3), 10, rng.uniform(0.005, 0.03)
+        (radius_rows, _), seconds = timed(lambda: index.within_radius(q_lat, q_lon, km))
+        latencies["radius"].append(seconds)
+        (_, nearest_km), seconds = timed(lambda: index.nearest(q_lat, q_lon, k))
+        latencies["nearest"].append(seconds)
+        bbox_rows, seconds = timed(lambda: index.within_bbox(q_lat - half, q_lon - half, q_lat + half, q_lon + half))
+        latencies["bbox"].append(seconds)
+        sizes["radius"].append(len(radius_rows))
+        sizes["nearest"].append(len(nearest_km))
+        sizes["bbox"].append(len(bbox_rows))
+        if check:
+            distances = haversine_km(q_lat, q_lon, lat, lon)
+            in_box = (lat >= q_lat - half) & (lat <= q_lat + half) & (lon >= q_lon - half) & (lon <= q_lon + half)
+            wrong += set(radius_rows) != set(np.flatnonzero(distances <= km))
+            wrong += not np.allclose(nearest_km, np.sort(distances)[:k])
+            wrong += set(bbox_rows) != set(np.flatnonzero(in_box))
+    return latencies, sizes, wrong
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time spatial index queries and check them against a brute-force scan")
+    parser.add_argument("--points", nargs="+", type=int, default=[10000, 1000000], help="synthetic point counts")
+    parser.add_argument("--queries", type=int, default=2000, help="queries of each kind per point set")
+    parser.add_argument("--check", type=int, default=200, help="queries checked against a brute-force scan")
+    parser.add_argument("--max-ms", type=float, default=1.0, help="allowed median query time")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    locations = pd.read_csv(COORDINATES_PATH)
+    point_sets = [("bundled", locations['lat'].to_numpy(), locations['lon'].to_numpy())]
+    for points in args.points:
+        centres = rng.integers(len(locations), size=points)
+        point_sets.append((f"{points} points", locations['lat'].to_numpy()[centres] + rng.normal(0, 0.01, points),
+                           locations['lon'].to_numpy()[centres] + rng.normal(0, 0.01, points)))
+
+    failed = False
+    print(f"{'points':<16}{'build (ms)':>11}{'query':>9}{'median (us)':>13}{'p99 (us)':>10}{'rows':>9}")
+    for label, lat, lon in point_sets:
+        index, build_seconds = timed(lambda: SpatialIndex(lat, lon))
+        _, _, wrong = run_queries(index, lat, lon, args.check, rng, check=True)
+        timing, sizes, _ = run_queries(index, lat, lon, args.queries, rng, check=False)
+        for kind, seconds in timing.items():
+            median, p99, rows = np.median(seconds) * 1e6, np.percentile(seconds, 99) * 1e6, np.mean(sizes[kind])
+            print(f"{label:<16}{build_seconds * 1e3:>11.1f}{kind:>9}{median:>13.0f}{p99:>10.0f}{rows:>9.0f}")
+            failed |= rows <= 1000 and median > args.max_ms * 1000
+        if wrong:
+            failed = True
+            print(f"FAIL: {wrong} answers differ from a brute-force scan")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Dashboard startup benchmark
+#
+# Compares time-to-first-paint of the eager dashboard build (every tab built up front)
+# against the lazy tab mode (tabs built on first activation, with their figures cached per
+# process).
+#
+# Each mode runs in a fresh interpreter so import and data loading costs are included.
+# "First paint" is the time from starting `dashboard.py` until the Bokeh model for the
+# initially visible tab has been rendered. A second session is then simulated in the
+# same process, the way `panel serve` re-runs the script for every new browser session.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/startup_benchmark.py --repeat 3
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Runs inside the child interpreter
+SESSION_SCRIPT = '''
+import json, runpy, time
+start = time.perf_counter()
+namespace = runpy.run_path("dashboard.py", run_name="bokeh_app")
+script_done = time.perf_counter()
+namespace["dashboard"].get_root()
+first_paint = time.perf_counter()
+namespace = runpy.run_path("dashboard.py", run_name="bokeh_app")
+namespace["dashboard"].get_root()
+second_session = time.perf_counter()
+print(json.dumps({
+    "script": script_done - start,
+    "first_paint": first_paint - start,
+    "second_session": second_session - first_paint,
+}))
+'''
+
+
+def run_mode(lazy):
+    env = dict(os.environ, DASHBOARD_LAZY_TABS="1" if lazy else "0")
+    result = subprocess.run([sys.executable, "-c", SESSION_SCRIPT], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dashboard time-to-first-paint with eager and lazy tab building")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per mode")
+    args = parser.parse_args()
+
+    results = {}
+    for mode, lazy in (("eager", False), ("lazy", True)):
+        runs = [run_mode(lazy) for _ in range(args.repeat)]
+        results[mode] = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+
+    print(f"{'mode':<8}{'script (s)':>14}{'first paint (s)':>18}{'next session (s)':>19}")
+    for mode, timings in results.items():
+        print(f"{mode:<8}{timings['script']:>14.3f}{timings['first_paint']:>18.3f}{timings['second_session']:>19.3f}")
+    speedup = results["eager"]["first_paint"] / results["lazy"]["first_paint"]
+    print(f"\nlazy time-to-first-paint speedup: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Streaming vs in-memory aggregation
+#
+# Generates synthetic census files of increasing size (see `generate_census_data.py`) and,
+# for each, computes the derived tables in a fresh interpreter twice: from the whole table
+# loaded in memory (`aggregates.derived_tables`) and in chunks
+# (`streaming_aggregates.stream_derived_tables`). Reports wall time and peak RSS of both
+# and checks that the tables are identical, index and dtypes included.
+#
+# Exits with status 1 if any table differs.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/streaming_benchmark.py [--neighbourhoods 10000 100000] [--years 10]
+#         [--chunksize 100000]
+
+import argparse
+import json
+import pickle
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from generate_census_data import generate
+
+# Runs inside the child interpreter
+AGGREGATE_SCRIPT = '''
+import json, pickle, resource, sys, time
+import pandas as pd
+from aggregates import derived_tables
+from census_data import load_census_data
+from streaming_aggregates import stream_derived_tables
+mode, path, chunksize, output = sys.argv[1], sys.argv[2], int(sys.argv[3]), sys.argv[4]
+start = time.perf_counter()
+tables = derived_tables(load_census_data(path)) if mode == "memory" else stream_derived_tables(path, chunksize)
+elapsed = time.perf_counter() - start
+with open(output, "wb") as f:
+    pickle.dump(tables, f)
+print(json.dumps({"seconds": elapsed, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+'''
+
+
+def run_aggregation(mode, path, chunksize, output):
+    result = subprocess.run([sys.executable, "-c", AGGREGATE_SCRIPT, mode, str(path), str(chunksize), str(output)],
+                            cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    with open(output, "rb") as f:
+        return json.loads(result.stdout.strip().splitlines()[-1]), pickle.load(f)
+
+
+def differences(expected, actual):
+    failed = []
+    for name, table in expected.items():
+        check = pd.testing.assert_frame_equal if isinstance(table, pd.DataFrame) else pd.testing.assert_series_equal
+        try:
+            check(actual[name], table, check_exact=True)
+        except AssertionError:
+            failed.append(name)
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare streaming and in-memory aggregation on synthetic census files")
+    parser.add_argument("--neighbourhoods", nargs="+", type=int, default=[10000, 100000])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--chunksize", type=int, default=100_000, help="CSV rows per chunk")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'rows':>10}{'file (MB)':>11}{'mode':>11}{'seconds':>10}{'peak RSS (MB)':>15}")
+    with tempfile.TemporaryDirectory() as data_dir:
+        data_dir = Path(data_dir)
+        for neighbourhoods in args.neighbourhoods:
+            census_path = data_dir / "census.csv"
+            rows = generate(census_path, data_dir / "coordinates.csv", neighbourhoods, args.years)
+            size_mb = census_path.stat().st_size / 2**20
+            results = {}
+            for mode in ("memory", "streaming"):
+                stats, results[mode] = run_aggregation(mode, census_path, args.chunksize, data_dir / f"{mode}.pickle")
+                print(f"{rows:>10}{size_mb:>11.1f}{mode:>11}{stats['seconds']:>10.2f}{stats['peak_rss_mb']:>15.1f}")
+            mismatched = differences(results["memory"], results["streaming"])
+            if mismatched:
+                failed = True
+                print(f"FAIL: streaming tables differ: {', '.join(mismatched)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Benchmark suite: data load, aggregation and figure build
+#
+# Times, for the bundled census data and for synthetic copies scaled 10x/100x/1000x:
+#
+# - loading the census CSV (plain `pd.read_csv`, and `load_census_data` from the CSV and
+#   from the Feather cache)
+# - each derived table in the dashboard's "Global available data" section, the
+#   neighbourhood row index, the rankings, the yearly estimates and the full
+#   `compute_aggregates`
+# - each pane function in `dashboard.py`, built and rendered to a Bokeh model, with the
+#   figure cache and instrumentation bypassed
+# - the whole dashboard with every tab built up front (`DASHBOARD_LAZY_TABS=0`)
+#
+# Scaled datasets replicate the neighbourhoods (with jittered coordinates) and the census
+# years (shifted past the last real year), about the cube root of the factor in years and
+# the rest in neighbourhoods. They are generated with a fixed seed, so every run measures
+# the same data. Each scale runs in a fresh interpreter with CENSUS_DATA_PATH and
+# COORDINATES_PATH pointing at its files.
+#
+# A benchmark is repeated `--repeat` times and the median and minimum are reported, unless
+# its first run takes longer than `--max-seconds`. Results are printed as a table and,
+# with `--output`, written as JSON together with the library versions and git commit.
+#
+# Usage (from the repository root):
+#
+#     python benchmarks/suite.py [--scales 1 10 100 1000] [--repeat 5] [--skip 'pane:*map*']
+#         [--output results.json]
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from census_data import CENSUS_DATA_PATH, COORDINATES_PATH
+
+# Runs inside the child interpreter and prints one JSON line per benchmark as it finishes,
+# so the results gathered before a timeout are kept
+BENCH_SCRIPT = '''
+import fnmatch, inspect, json, os, runpy, statistics, sys, time
+import pandas as pd
+import panel as pn
+import aggregates, census_data
+from aggregates import NeighbourhoodRows, compute_aggregates, table_builders
+from figure_cache import figure_cache
+from rankings import TopNRanking
+from temporal_interpolation import AnnualEstimates
+
+repeat, max_seconds, skip = int(sys.argv[1]), float(sys.argv[2]), sys.argv[3:]
+path, coordinates_path = census_data.CENSUS_DATA_PATH, census_data.COORDINATES_PATH
+
+def measure(name, fn, setup=None):
+    if any(fnmatch.fnmatch(name, pattern) for pattern in skip):
+        return
+    runs = []
+    while len(runs) < repeat:
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+        if runs[0] > max_seconds:
+            break
+    print(json.dumps({"name": name, "runs": len(runs), "median": statistics.median(runs), "min": min(runs)}), flush=True)
+
+def remove_columnar_cache():
+    census_data.columnar_cache_path(path).unlink(missing_ok=True)
+
+measure("load:read_csv", lambda: pd.read_csv(path, index_col="year"))
+measure("load:load_census_data[csv]", lambda: census_data.load_census_data(path), setup=remove_columnar_cache)
+if census_data.feather is not None:
+    census_data.build_columnar_cache(path, census_data.census_dtypes)
+    measure("load:load_census_data[feather]", lambda: census_data.load_census_data(path))
+
+to_data = census_data.load_census_data(path)
+locations = census_data.load_neighbourhood_locations(coordinates_path)
+for table, build in table_builders.items():
+    measure(f"aggregate:{table}", lambda build=build: build(to_data))
+measure("aggregate:neighbourhood_rows", lambda: NeighbourhoodRows(to_data["neighbourhood"]))
+measure("aggregate:rankings", lambda: TopNRanking.from_frame(to_data))
+measure("aggregate:annual_estimates", lambda: AnnualEstimates.from_frame(to_data))
+measure("aggregate:compute_aggregates", lambda: compute_aggregates(to_data, locations))
+measure("aggregate:get_aggregates[cold]", aggregates.get_aggregates, setup=aggregates._cache.clear)
+
+os.environ["DASHBOARD_LAZY_TABS"] = "1"
+dashboard = runpy.run_path("dashboard.py", run_name="benchmark_dashboard")
+panes = {
+    "neighbourhood_map": (),
+    "average_house_value": (),
+    "average_value_by_neighbourhood": (),
+    "number_dwelling_types": (),
+    "dwelling_types_by_year": (),
+    "average_house_value_snapshot": (),
+    "top_most_expensive_neighbourhoods": (10,),
+    "sunburts_cost_analysis": (10,),
+}
+for pane, args in panes.items():
+    # Skip the instrumentation and figure cache wrappers to time the build itself
+    build = inspect.unwrap(dashboard[pane])
+    measure(f"pane:{pane}", lambda build=build, args=args: pn.panel(build(*args)).get_root())
+
+def clear_caches():
+    figure_cache.clear()
+    pn.state.clear_caches()
+
+def build_dashboard():
+    runpy.run_path("dashboard.py", run_name="benchmark_dashboard")["dashboard"].get_root()
+
+os.environ["DASHBOARD_LAZY_TABS"] = "0"
+measure("dashboard:full_build", build_dashboard, setup=clear_caches)
+'''
+
+
+def scaled_dataset(factor, out_dir, census_path=CENSUS_DATA_PATH, coordinates_path=COORDINATES_PATH, seed=0):
+    # Writes a census and coordinates CSV about `factor` times the size of the originals
+    census = pd.read_csv(census_path, encoding="utf-8-sig")
+    locations = pd.read_csv(coordinates_path)
+    year_copies = max(1, round(factor ** (1 / 3)))
+    neighbourhood_copies = math.ceil(factor / year_copies)
+    rng = np.random.default_rng(seed)
+
+    years = np.sort(census["year"].unique())
+    year_span = years[-1] - years[0] + (years[1] - years[0] if len(years) > 1 else 1)
+    census = pd.concat([census.assign(year=census["year"] + copy * year_span) for copy in range(year_copies)], ignore_index=True)
+
+    def copy_name(names, copy):
+        return names if copy == 0 else names + f" #{copy}"
+
+    census = pd.concat([census.assign(neighbourhood=copy_name(census["neighbourhood"], copy)) for copy in range(neighbourhood_copies)], ignore_index=True)
+    locations = pd.concat([
+        locations.assign(
+            neighbourhood=copy_name(locations["neighbourhood"], copy),
+            lat=locations["lat"] + (rng.normal(0, 0.05, len(locations)) if copy else 0),
+            lon=locations["lon"] + (rng.normal(0, 0.05, len(locations)) if copy else 0),
+        )
+        for copy in range(neighbourhood_copies)
+    ], ignore_index=True)
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    scaled_census, scaled_coordinates = out_dir / f"census_x{factor}.csv", out_dir / f"coordinates_x{factor}.csv"
+    census.to_csv(scaled_census, index=False)
+    locations.to_csv(scaled_coordinates, index=False)
+    return scaled_census, scaled_coordinates, len(census)
+
+
+def run_scale(census_path, coordinates_path, args):
+    env = dict(os.environ, CENSUS_DATA_PATH=str(census_path), COORDINATES_PATH=str(coordinates_path))
+    command = [sys.executable, "-c", BENCH_SCRIPT, str(args.repeat), str(args.max_seconds), *args.skip]
+    try:
+        result = subprocess.run(command, cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=args.timeout)
+        output, error = result.stdout, (result.stderr if result.returncode else None)
+    except subprocess.TimeoutExpired as timeout:
+        output = timeout.stdout.decode() if isinstance(timeout.stdout, bytes) else timeout.stdout or ""
+        error = f"timed out after {args.timeout}s"
+    results = [json.loads(line) for line in output.splitlines() if line.startswith('{"name"')]
+    return results, error
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    import bokeh, holoviews, panel, plotly
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "panel": panel.__version__,
+        "plotly": plotly.__version__,
+        "holoviews": holoviews.__version__,
+        "bokeh": bokeh.__version__,
+        "commit": git_commit(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time data load, aggregation and figure build at several data scales")
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 10, 100], help="dataset sizes as multiples of the bundled data (add 1000 for national scale)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark")
+    parser.add_argument("--max-seconds", type=float, default=5.0, help="run a benchmark only once if its first run takes longer")
+    parser.add_argument("--timeout", type=float, default=1800, help="seconds allowed per scale")
+    parser.add_argument("--skip", nargs="*", default=[], help="glob patterns of benchmarks to skip, e.g. 'pane:*map*'")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    args = parser.parse_args()
+
+    report = {"environment": environment(), "scales": []}
+    with tempfile.TemporaryDirectory() as data_dir:
+        for factor in args.scales:
+            census_path, coordinates_path, rows = scaled_dataset(factor, data_dir)
+            results, error = run_scale(census_path, coordinates_path, args)
+            report["scales"].append({"factor": factor, "rows": rows, "results": results, "error": error})
+
+            print(f"\nx{factor} ({rows} rows)")
+            print(f"{'benchmark':<48}{'runs':>6}{'median (s)':>12}{'min (s)':>12}")
+            for result in results:
+                print(f"{result['name']:<48}{result['runs']:>6}{result['median']:>12.4f}{result['min']:>12.4f}")
+            if error:
+                print(f"incomplete: {error.strip().splitlines()[-1]}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# Monte Carlo projections of buying a rental dwelling in every neighbourhood.
+#
+# Each neighbourhood starts from its latest census year: the purchase price is its average
+# house value, rent is its monthly rented shelter cost and yearly operating costs (property
+# tax, insurance, maintenance) are `operating_cost_share` of its owned shelter costs.
+# Every scenario draws, for each year of the horizon:
+#
+# - house value appreciation: the neighbourhood's historical growth rate (first to last
+#   census year) plus a citywide market shock shared by all neighbourhoods in the scenario
+#   and a neighbourhood-specific shock, all on log growth
+# - rent growth: likewise, from the neighbourhood's historical rent growth
+# - vacancy: a beta-distributed citywide share of the year rentals stand empty, mean `vacancy`
+#   (exactly `vacancy` every year when it is 0 or 1, where the beta distribution is undefined)
+#
+# and one fixed mortgage rate per scenario for a loan of (1 - down_payment) of the price.
+# Only the final house value depends on appreciation, and a sum of normal log growth rates
+# is normal, so each neighbourhood and scenario draws its total appreciation once instead
+# of once per year.
+# The result per neighbourhood is the distribution over scenarios of the annualized return
+# on the down payment, counting net rental cash flow and the equity at the end of the
+# horizon, and of the first year's cash flow.
+#
+# Rent growth, costs and cash flows are (neighbourhoods x scenarios x years) NumPy arrays,
+# computed in blocks of neighbourhoods, so memory stays at `block_elements` values per array
+# whatever the number of neighbourhoods. Large runs spread the blocks over a process pool of
+# SIMULATION_WORKERS processes (default: one per CPU). Every block is seeded by the seed and
+# its first row, so results are the same with any number of workers.
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+block_elements = 4_000_000
+# Runs smaller than this many (neighbourhood, scenario, year) values are simulated in-process
+parallel_elements = 20_000_000
+percentiles = [5, 50, 95]
+
+
+@dataclass(frozen=True)
+class SimulationParameters:
+    scenarios: int = 10_000
+    years: int = 10
+    down_payment: float = 0.2
+    amortization_years: int = 25
+    mortgage_rate: float = 0.05
+    mortgage_rate_sd: float = 0.01
+    vacancy: float = 0.05
+    # Sum of the beta distribution's parameters; higher means less spread around `vacancy`
+    vacancy_concentration: float = 40
+    operating_cost_share: float = 0.35
+    market_sd: float = 0.04
+    rent_market_sd: float = 0.02
+    neighbourhood_sd: float = 0.02
+    seed: int = 0
+
+    def __post_init__(self):
+        if self.scenarios < 1 or self.years < 1 or self.amortization_years < 1:
+            raise ValueError("scenarios, years and amortization_years must be at least 1")
+        if not 0 < self.down_payment <= 1:
+            raise ValueError(f"down_payment must be in (0, 1], got {self.down_payment}")
+        if not 0 <= self.vacancy <= 1:
+            raise ValueError(f"vacancy must be in [0, 1], got {self.vacancy}")
+        if self.vacancy_concentration <= 0:
+            raise ValueError(f"vacancy_concentration must be positive, got {self.vacancy_concentration}")
+
+
+def simulation_inputs(to_data):
+    # Latest price and costs, and historical yearly growth of value and rent, per neighbourhood
+    rows = to_data.reset_index().sort_values('year', kind='stable')
+    grouped = rows.groupby('neighbourhood', observed=True)
+    first, last = grouped.first(), grouped.last()
+    span = (last['year'] - first['year']).to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        def growth(column):
+            ratio = last[column].to_numpy(dtype=np.float64) / first[column].to_numpy(dtype=np.float64)
+            return np.where((span > 0) & (ratio > 0), ratio ** (1 / span) - 1, 0.0)
+        return pd.DataFrame({
+            'value': last['average_house_value'].to_numpy(dtype=np.float64),
+            'rent': last['shelter_costs_rented'].to_numpy(dtype=np.float64),
+            'owned_costs': last['shelter_costs_owned'].to_numpy(dtype=np.float64),
+            'value_growth': growth('average_house_value'),
+            'rent_growth': growth('shelter_costs_rented'),
+        }, index=last.index)
+
+
+def market_draws(params):
+    # Draws shared by every neighbourhood of a scenario: total log appreciation over the
+    # horizon and mortgage rate per scenario, rent growth shocks and vacancy per scenario
+    # and year
+    rng = np.random.default_rng([params.seed])
+    shape = (params.scenarios, params.years)
+    concentration = params.vacancy_concentration
+    appreciation, rent_growth = rng.normal(0, params.market_sd, shape).sum(axis=1), rng.normal(0, params.rent_market_sd, shape)
+    if 0 < params.vacancy < 1:
+        vacancy = rng.beta(params.vacancy * concentration, (1 - params.vacancy) * concentration, shape)
+    else:
+        vacancy = np.full(shape, float(params.vacancy))
+    return (appreciation, rent_growth, vacancy,
+            np.clip(rng.normal(params.mortgage_rate, params.mortgage_rate_sd, params.scenarios), 0.001, None))
+
+
+def simulate_block(start, inputs, market, params):
+    # Summary statistics for one block of neighbourhoods; inputs holds its columns of
+    # simulation_inputs as arrays
+    market_appreciation, market_rent_growth, vacancy, mortgage_rates = market
+    rng = np.random.default_rng([params.seed, start])
+    shape = (len(inputs['value']), params.scenarios, params.years)
+    column = lambda name: inputs[name][:, None, None]
+
+    appreciation = (params.years * np.log1p(inputs['value_growth'])[:, None] + market_appreciation
+                    + rng.normal(0, params.neighbourhood_sd * np.sqrt(params.years), shape[:2]))
+    rent_growth = column('rent_growth') + market_rent_growth + rng.normal(0, params.neighbourhood_sd, shape)
+
+    # Rent and costs of year t grow by the rent growth of years 1..t-1
+    rent_index = np.cumprod(1 + rent_growth, axis=2)
+    rent_index[:, :, 1:] = rent_index[:, :, :-1]
+    rent_index[:, :, 0] = 1
+    income = 12 * column('rent') * rent_index * (1 - vacancy)
+    operating_costs = params.operating_cost_share * 12 * column('owned_costs') * rent_index
+
+    # Monthly mortgage payment and the balance left after the horizon, per scenario
+    loan = (1 - params.down_payment) * inputs['value'][:, None]
+    monthly_rate = mortgage_rates / 12
+    payments = 12 * params.amortization_years
+    monthly_payment = loan * monthly_rate / (1 - (1 + monthly_rate) ** -payments)
+    paid = min(12 * params.years, payments)
+    growth = (1 + monthly_rate) ** paid
+    balance = np.maximum(loan * growth - monthly_payment * (growth - 1) / monthly_rate, 0)
+
+    # No payments are due once the loan is amortized
+    paying = np.arange(params.years) < params.amortization_years
+    cash_flow = income - operating_costs - 12 * monthly_payment[:, :, None] * paying
+    equity = inputs['value'][:, None] * np.exp(appreciation) - balance
+    invested = params.down_payment * inputs['value'][:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        multiple = (cash_flow.sum(axis=2) + equity) / invested
+        annualized = np.where(multiple > 0, np.abs(multiple) ** (1 / params.years) - 1, -1.0)
+
+    summary = {f'return_p{p}_pct': values * 100 for p, values in zip(percentiles, np.percentile(annualized, percentiles, axis=1))}
+    summary['loss_probability'] = (multiple < 1).mean(axis=1)
+    summary['first_year_cash_flow'] = np.median(cash_flow[:, :, 0], axis=1)
+    summary['negative_cash_flow_probability'] = (cash_flow[:, :, 0] < 0).mean(axis=1)
+    return summary
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def simulation_executor():
+    # Created on first use and shared by later runs. Spawned rather than forked, since the
+    # dashboard server runs simulations from its pane threads.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = int(os.getenv("SIMULATION_WORKERS", os.cpu_count()))
+            _executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def simulate(inputs, params=SimulationParameters(), parallel=None):
+    # One row per neighbourhood of inputs (see simulation_inputs) with the distribution of
+    # annualized returns, the probability of losing money over the horizon and the median
+    # and probability of a negative first-year cash flow
+    rows = max(1, block_elements // (params.scenarios * params.years))
+    arrays = {name: inputs[name].to_numpy(dtype=np.float64) for name in inputs.columns}
+    blocks = [(start, {name: values[start:start + rows] for name, values in arrays.items()}) for start in range(0, len(inputs), rows)]
+    market = market_draws(params)
+    if parallel is None:
+        parallel = len(blocks) > 1 and len(inputs) * params.scenarios * params.years >= parallel_elements and os.cpu_count() > 1
+    if parallel:
+        executor = simulation_executor()
+        summaries = list(executor.map(simulate_block, *zip(*blocks), [market] * len(blocks), [params] * len(blocks)))
+    else:
+        summaries = [simulate_block(start, block, market, params) for start, block in blocks]
+    return pd.DataFrame({name: np.concatenate([summary[name] for summary in summaries]) for name in summaries[0]}, index=inputs.index)
@@ -0,0 +1,152 @@
+# Loading of the Toronto census and neighbourhood coordinates data.
+#
+# Both `dashboard.py` and `rental_analysis.py` read their input through these helpers so
+# the file locations and parsing options live in one place.
+#
+# Parsing the CSVs dominates cold start on large census files, so they can be converted
+# once into uncompressed Feather (Arrow IPC) files in a `cache/` directory next to each
+# CSV (`Data/cache/` for the bundled data):
+#
+#     python census_data.py
+#
+# which also validates the input files (see `data_validation.py`) and prints any failed
+# checks.
+#
+# The loaders memory-map a cache file when it is newer than its CSV and fall back to the
+# CSV otherwise (or when pyarrow is not installed).
+#
+# New census releases are added by dropping a CSV with the same columns, holding only the
+# new year, next to the main census file, e.g. `Data/toronto_neighbourhoods_census_data_2021.csv`.
+# Only that file is parsed and validated; see `aggregates.get_aggregates`.
+
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from pyarrow import feather
+except ImportError:  # the columnar cache is optional
+    feather = None
+
+# Both can be pointed at other datasets with the CENSUS_DATA_PATH and COORDINATES_PATH
+# environment variables
+CENSUS_DATA_PATH = Path(os.getenv("CENSUS_DATA_PATH", "Data/toronto_neighbourhoods_census_data.csv"))
+COORDINATES_PATH = Path(os.getenv("COORDINATES_PATH", "Data/toronto_neighbourhoods_coordinates.csv"))
+
+dwelling_types = ['single_detached_house', 'apartment_five_storeys_plus','movable_dwelling', 'semi_detached_house','row_house', 'duplex','apartment_five_storeys_less','other_house']
+
+# Compact dtypes for the census table. Neighbourhood names repeat once per census year so
+# they are stored as a categorical, and every count or dollar amount is a small unsigned int.
+census_dtypes = {
+    "year": "uint16",
+    "neighbourhood": "category",
+    **dict.fromkeys(dwelling_types, "uint32"),
+    "average_house_value": "uint32",
+    "shelter_costs_owned": "uint16",
+    "shelter_costs_rented": "uint16",
+}
+
+# (path, size, mtime) -> content hash, so unchanged files are not re-read to be hashed
+_hash_cache = {}
+
+
+def file_hash(path):
+    path = Path(path)
+    stat = os.stat(path)
+    key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    if key not in _hash_cache:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        _hash_cache[key] = digest.hexdigest()
+    return _hash_cache[key]
+
+
+def apply_dtypes(df, dtypes):
+    # pandas wraps out-of-range values silently when casting, so check the bounds first
+    for column, dtype in dtypes.items():
+        if dtype == "category":
+            continue
+        limits = np.iinfo(dtype)
+        values = df[column]
+        if len(values) and (values.min() < limits.min or values.max() > limits.max):
+            raise ValueError(f"{column} has values outside the {dtype} range")
+    return df.astype(dtypes)
+
+
+def columnar_cache_path(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.parent / "cache" / (csv_path.stem + ".feather")
+
+
+def build_columnar_cache(csv_path, dtypes=None):
+    if feather is None:
+        raise ImportError("pyarrow is required to build the columnar cache")
+    cache_path = columnar_cache_path(csv_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    # Written uncompressed so the file can be memory-mapped when loading
+    tmp_path = cache_path.with_suffix(".tmp")
+    df = pd.read_csv(csv_path)
+    if dtypes is not None:
+        df = apply_dtypes(df, dtypes)
+    feather.write_feather(df, tmp_path, compression="uncompressed")
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def columnar_cache_is_fresh(csv_path):
+    try:
+        return columnar_cache_path(csv_path).stat().st_mtime_ns > os.stat(csv_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def read_table(csv_path):
+    if feather is not None and columnar_cache_is_fresh(csv_path):
+        # split_blocks keeps numeric columns as zero-copy, read-only views of the mapped
+        # file, so processes loading the same cache share its pages
+        table = feather.read_table(columnar_cache_path(csv_path), memory_map=True)
+        return table.to_pandas(split_blocks=True)
+    return pd.read_csv(csv_path)
+
+
+def load_census_data(path=CENSUS_DATA_PATH):
+    return apply_dtypes(read_table(path), census_dtypes).set_index("year")
+
+
+def census_year_files(path=CENSUS_DATA_PATH):
+    path = Path(path)
+    return sorted(path.parent.glob(f"{path.stem}_[0-9][0-9][0-9][0-9].csv"))
+
+
+def load_census_year(path, known_years=()):
+    year = int(Path(path).stem[-4:])
+    if year in known_years:
+        raise ValueError(f"census year {year} is already loaded")
+    df = read_table(path)
+    missing = set(census_dtypes) - set(df.columns)
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(sorted(missing))}")
+    df = apply_dtypes(df.loc[:, list(census_dtypes)], census_dtypes)
+    if (df["year"] != year).any():
+        raise ValueError(f"rows for years other than {year}")
+    if df["neighbourhood"].duplicated().any():
+        raise ValueError("duplicate neighbourhoods")
+    return df.set_index("year")
+
+
+def load_neighbourhood_locations(path=COORDINATES_PATH):
+    return read_table(path)
+
+
+if __name__ == "__main__":
+    from data_validation import failures, validate
+
+    for check in failures(validate(CENSUS_DATA_PATH, COORDINATES_PATH)):
+        print(f"validation failed: {check['check']}: {check['message']}")
+    for csv_path, dtypes in ((CENSUS_DATA_PATH, census_dtypes), (COORDINATES_PATH, None)):
+        print(f"{csv_path} -> {build_columnar_cache(csv_path, dtypes)}")
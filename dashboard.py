@@ -9,32 +9,37 @@
 
 
 # imports
+# The plotting libraries are imported by the panes that use them (see plotting_backends.py)
 import panel as pn
-pn.extension('plotly')
-import plotly.express as px
+import param
 import pandas as pd
-import hvplot.pandas
-import matplotlib.pyplot as plt
+import numpy as np
 import os
-from pathlib import Path
 from dotenv import load_dotenv
+from aggregates import get_aggregates
+from async_panes import PreparedPlotly, async_pane
+from figure_cache import cached_figure, figure_cache
+from instrumentation import figure_construction, instrumented, metrics_frame
+from census_data import dwelling_types
+from cash_flow_simulator import SimulationParameters, simulate, simulation_inputs
+from level_of_detail import aggregate_points, needs_level_of_detail, neighbourhood_page, page_count, viewport_bounds, zoom_level
+from plotting_backends import hvplot, plotly_express
 
 
 # In[2]:
 
 
 # Initialize the Panel Extensions (for Plotly)
-import panel as pn
-pn.extension("plotly")
+pn.extension("plotly", "tabulator")
 
 
 # In[3]:
 
 
 # Read the Mapbox API key
+# It is passed to Plotly when plotly.express is first imported by a map pane
 load_dotenv()
 map_box_api = os.getenv("mapbox")
-px.set_mapbox_access_token(map_box_api)
 
 
 # # Import Data
@@ -43,11 +48,10 @@ px.set_mapbox_access_token(map_box_api)
 
 
 # Import the CSVs to Pandas DataFrames
-file_path = Path("Data/toronto_neighbourhoods_census_data.csv")
-to_data = pd.read_csv(file_path, index_col="year")
-
-file_path = Path("Data/toronto_neighbourhoods_coordinates.csv")
-df_neighbourhood_locations = pd.read_csv(file_path)
+# The census data and everything derived from it is computed once per server process.
+# New census years dropped into Data/ are merged in and picked up by the next session.
+census = get_aggregates()
+to_data = census.to_data
 
 
 # - - -
@@ -71,20 +75,23 @@ df_neighbourhood_locations = pd.read_csv(file_path)
 
 # Getting the data from the top 10 expensive neighbourhoods
 # YOUR CODE HERE!
-avg_house_value_by_neighbourhood = to_data.loc[:,['neighbourhood','average_house_value']]
-neighbourhoods_value_avg = avg_house_value_by_neighbourhood.reset_index().drop(columns=['year']).groupby(['neighbourhood']).mean()
+neighbourhoods_value_avg = census.neighbourhoods_value_avg
 
 # Calculate the mean number of dwelling types units per year
 # YOUR CODE HERE!
-dwelling_types = ['single_detached_house', 'apartment_five_storeys_plus','movable_dwelling', 'semi_detached_house','row_house', 'duplex','apartment_five_storeys_less','other_house']
-no_of_dwelling_by_year = to_data.loc[:,dwelling_types].groupby(by='year').sum()
+no_of_dwelling_by_year = census.no_of_dwelling_by_year
 
 # Calculate the average monthly shelter costs for owned and rented dwellings
 # YOUR CODE HERE!
-monthly_avg_costs_by_year = to_data.loc[:,['shelter_costs_owned','shelter_costs_rented']].groupby(by='year').mean()
+monthly_avg_costs_by_year = census.monthly_avg_costs_by_year
 monthly_avg_costs_by_year
 
-avg_house_value = to_data['average_house_value'].groupby(by='year').mean()
+avg_house_value = census.avg_house_value
+
+# Yearly estimates between census years (see temporal_interpolation.py), shown instead of
+# the census years when a chart's toggle is set to 'Interpolated'
+annual_estimates = census.annual_estimates
+data_options = ['Observed', 'Interpolated']
 
 
 # In[6]:
@@ -99,28 +106,115 @@ avg_house_value = to_data['average_house_value'].groupby(by='year').mean()
 
 
 # Define Panel visualization functions
-def neighbourhood_map():
-    df_neighbourhood_locations.set_index('neighbourhood', inplace=True)
-    neighbourhood_avg_value_with_location = pd.concat([df_neighbourhood_locations, neighbourhoods_value_avg], axis=1)
-    neighbourhood_avg_value_with_location = neighbourhood_avg_value_with_location.reset_index()
-    map_plot = px.scatter_mapbox(
-        neighbourhood_avg_value_with_location,
-        lat="lat",
-        lon="lon",
-        size="average_house_value",
-        color="neighbourhood",
-        title = "Average House Values in Toronto",
-        zoom=10,
-        width=1500,
-        height=800
-    )
+# The Plotly figures are cached as JSON per data version and shared by every session.
+# Every pane builder is instrumented (see instrumentation.py); the code inside
+# figure_construction() is timed as figure construction, the rest as data preparation.
+
+# The location table is joined and indexed once per data version, so this is a pure
+# function of the data and can be called any number of times.
+# Past DASHBOARD_LOD_THRESHOLD neighbourhoods (see level_of_detail.py) the map is a single
+# trace colored by house value, with nearby neighbourhoods merged for the given zoom level
+# and, once the user has moved the map, only the neighbourhoods within bounds, found with
+# the spatial index.
+level_of_detail = needs_level_of_detail(len(census.neighbourhood_rows))
+
+@instrumented
+@cached_figure(version=lambda: census.version)
+def neighbourhood_map(zoom=10, bounds=None):
+    px = plotly_express()
+    if level_of_detail:
+        locations = census.neighbourhood_value_locations
+        if bounds is not None:
+            locations = locations.iloc[np.sort(census.spatial_index.within_bbox(*bounds))]
+        points = aggregate_points(locations, zoom)
+        with figure_construction():
+            map_plot = px.scatter_mapbox(
+                points,
+                lat="lat",
+                lon="lon",
+                size="neighbourhoods",
+                color="average_house_value",
+                hover_name="label",
+                title = "Average House Values in Toronto",
+                zoom=10,
+                width=1500,
+                height=800
+            )
+            # Keeps the user's zoom and position when the points are swapped for another zoom level
+            map_plot.update_layout(uirevision="neighbourhood_map")
+        return map_plot
+    with figure_construction():
+        map_plot = px.scatter_mapbox(
+            census.neighbourhood_value_locations,
+            lat="lat",
+            lon="lon",
+            size="average_house_value",
+            color="neighbourhood",
+            title = "Average House Values in Toronto",
+            zoom=10,
+            width=1500,
+            height=800
+        )
     return map_plot
    
     # YOUR CODE HERE!
 
+# Re-aggregates the level-of-detail map for the user's zoom level and viewport
+def neighbourhood_map_pane():
+    map_pane = PreparedPlotly(neighbourhood_map())
+    if level_of_detail:
+        def update(event):
+            relayout = event.new or {}
+            if 'mapbox.zoom' not in relayout:
+                return
+            zoom = zoom_level(relayout['mapbox.zoom'])
+            corners = relayout.get('mapbox._derived', {}).get('coordinates')
+            map_pane.object = neighbourhood_map(zoom, viewport_bounds(corners, zoom) if corners else None)
+        map_pane.param.watch(update, 'relayout_data')
+    return map_pane
+
+# Neighbourhoods around a row of census.neighbourhood_value_locations, from the spatial index
+@instrumented
+def nearby_neighbourhoods(row, km):
+    neighbourhood = census.neighbourhood_value_locations.iloc[row]
+    rows, distances = census.spatial_index.within_radius(neighbourhood['lat'], neighbourhood['lon'], km)
+    nearby = census.neighbourhood_value_locations.iloc[rows].assign(distance_km=distances.round(2))
+    return nearby.loc[rows != row, ['neighbourhood', 'distance_km', 'average_house_value']].dropna()
+
+# The closest neighbourhoods whose average house value is within tolerance of the row's
+@instrumented
+def comparable_neighbourhoods(row, n=5, tolerance=0.15, candidates=50):
+    neighbourhood = census.neighbourhood_value_locations.iloc[row]
+    rows, distances = census.spatial_index.nearest(neighbourhood['lat'], neighbourhood['lon'], candidates + 1)
+    nearby = census.neighbourhood_value_locations.iloc[rows].assign(distance_km=distances.round(2))
+    similar = (nearby['average_house_value'] / neighbourhood['average_house_value'] - 1).abs() <= tolerance
+    return nearby.loc[similar & (rows != row), ['neighbourhood', 'distance_km', 'average_house_value']].head(n)
+
+# The map plus, for the neighbourhood the user clicks, its surroundings and comparables
+def neighbourhood_explorer():
+    map_pane = neighbourhood_map_pane()
+    radius = pn.widgets.FloatSlider(name='Radius (km)', start=0.5, end=10, step=0.5, value=2)
+    selected = pn.pane.Markdown('Click a neighbourhood on the map to see the neighbourhoods around it.')
+    nearby = pn.pane.DataFrame(None, index=False)
+    comparables = pn.pane.DataFrame(None, index=False)
+    def update(*events):
+        points = (map_pane.click_data or {}).get('points')
+        if not points:
+            return
+        row = census.spatial_index.nearest(points[0]['lat'], points[0]['lon'])[0][0]
+        neighbourhood = census.neighbourhood_value_locations.iloc[row]
+        selected.object = f"**{neighbourhood['neighbourhood']}**: average house value ${neighbourhood['average_house_value']:,.0f}"
+        nearby.object = nearby_neighbourhoods(row, radius.value)
+        comparables.object = comparable_neighbourhoods(row)
+    map_pane.param.watch(update, 'click_data')
+    radius.param.watch(update, 'value')
+    return pn.Row(map_pane, pn.Column(radius, selected, '##### Within radius', nearby, '##### Comparable prices nearby', comparables))
+
 def create_bar_chart(data, title, xlabel, ylabel, color):
 #     plt.figure()
-    plot = data.hvplot.bar(title=title,color=color,xlabel=xlabel, ylabel=ylabel,rot=90, yformatter='$%.2f',height=600, width=800)
+    hvplot()
+    with figure_construction():
+        plot = data.hvplot.bar(title=title,color=color,xlabel=xlabel, ylabel=ylabel,rot=90, yformatter='$%.2f',height=600, width=800)
 #     plot = data.plot.bar(title=title,color=color)
 #     plot.set_xlabel(xlabel)
 #     plot.set_ylabel(ylabel)
@@ -129,50 +223,148 @@ def create_bar_chart(data, title, xlabel, ylabel, color):
     # YOUR CODE HERE!
 
 def create_line_chart(data, title, xlabel, ylabel, color):
-    return data.hvplot.line(title=title, xlabel=xlabel, ylabel=ylabel, color=color)
+    hvplot()
+    with figure_construction():
+        return data.hvplot.line(title=title, xlabel=xlabel, ylabel=ylabel, color=color)
     
     # YOUR CODE HERE!
 
-def average_house_value():
-    avg_house_value = to_data['average_house_value'].groupby(by='year').mean()
-    return avg_house_value.hvplot.line(title='Average House Value in Toronto', xlabel="Year", ylabel="Avg. House Value", yformatter='$%.2f', height=600, width=800)
+# Interpolated charts draw the yearly estimates as a line and the census years as points
+def with_census_points(plot, observed, color, **options):
+    with figure_construction():
+        return plot * observed.hvplot.scatter(color=color, **options)
+
+@instrumented
+def shelter_costs_chart(column, title, color, data='Observed'):
+    observed = monthly_avg_costs_by_year[column]
+    if data == 'Observed':
+        return create_line_chart(observed, title, "Year", "Avg Monthly Shelter Costs", color)
+    plot = create_line_chart(annual_estimates.citywide[column], title, "Year", "Avg Monthly Shelter Costs", color)
+    return with_census_points(plot, observed, color)
+
+@instrumented
+def average_house_value(data='Observed'):
+    hvplot()
+    values = avg_house_value if data == 'Observed' else annual_estimates.citywide['average_house_value']
+    with figure_construction():
+        plot = values.hvplot.line(title='Average House Value in Toronto', xlabel="Year", ylabel="Avg. House Value", yformatter='$%.2f', height=600, width=800)
+    if data == 'Observed':
+        return plot
+    return with_census_points(plot, avg_house_value, None, yformatter='$%.2f')
     # YOUR CODE HERE!
 
+# The neighbourhood panes only plot the selected neighbourhood's rows, looked up through
+# census.neighbourhood_rows, and the plot is updated in place when the selection changes.
+# hvplot's groupby='neighbourhood' would filter the whole frame on every change instead.
+# Extra keyword arguments add dimensions, with their values, after the neighbourhood.
+def neighbourhood_dynamic_map(plot, **values):
+    hv = hvplot()
+    return hv.DynamicMap(plot, kdims=['neighbourhood', *values]).redim.values(neighbourhood=list(census.neighbourhood_rows), **values)
+
+@instrumented
 def average_value_by_neighbourhood():
-    avg_house_value_by_neighbourhood = to_data.loc[:,['neighbourhood','average_house_value']]
-    return avg_house_value_by_neighbourhood.hvplot.line(groupby='neighbourhood', xlabel="Year", ylabel="Avg. House Value", yformatter='$%.2f')
+    @instrumented(name="average_value_by_neighbourhood:update")
+    def plot(neighbourhood, data):
+        avg_house_value_by_neighbourhood = census.neighbourhood_data(neighbourhood, 'average_house_value')
+        values = avg_house_value_by_neighbourhood if data == 'Observed' else annual_estimates.neighbourhood_data(neighbourhood, 'average_house_value')
+        with figure_construction():
+            line = values.hvplot.line(xlabel="Year", ylabel="Avg. House Value", yformatter='$%.2f')
+        if data == 'Observed':
+            # A DynamicMap returns the same type for every key, so this is an overlay too
+            return hvplot().Overlay([line])
+        return with_census_points(line, avg_house_value_by_neighbourhood, None, yformatter='$%.2f')
+    return pn.panel(neighbourhood_dynamic_map(plot, data=data_options))
     # YOUR CODE HERE!
 
+@instrumented
 def number_dwelling_types():
-    column_list = dwelling_types.copy()
-    column_list.append('neighbourhood')
-    no_of_dwelling_types_per_year_by_neighbourhood = to_data.loc[:,column_list]
-    return no_of_dwelling_types_per_year_by_neighbourhood.hvplot.bar(groupby='neighbourhood', rot=90, height=600, width=1000, xlabel='Year', ylabel='Dwelling Type Units')
+    @instrumented(name="number_dwelling_types:update")
+    def plot(neighbourhood):
+        no_of_dwelling_types_per_year_by_neighbourhood = census.neighbourhood_data(neighbourhood, dwelling_types)
+        with figure_construction():
+            return no_of_dwelling_types_per_year_by_neighbourhood.hvplot.bar(rot=90, height=600, width=1000, xlabel='Year', ylabel='Dwelling Type Units')
+    return pn.panel(neighbourhood_dynamic_map(plot))
     # YOUR CODE HERE!
 
-def average_house_value_snapshot():
-    avg_house_value_by_year = to_data.loc[:,['neighbourhood', 'average_house_value']].reset_index()
-
-    return px.bar(avg_house_value_by_year, x="neighbourhood", y="average_house_value", color="average_house_value", facet_row="year", width=1700, height=1200, title="Average House Values in Toronto per Neighbourhood", labels={
-                     "neighbourhood": "Neighbourhood",
-                     "average_house_value": "Avg. House Value",
-                     "average_house_value": "Avg. House Value"
-                 })
+# One dwelling types chart with a year selector, for however many census years there are.
+# The per-year sums are kept as a year-indexed array, so changing the year is a row lookup
+# and the chart is updated in place.
+dwelling_units_by_year = no_of_dwelling_by_year.to_numpy()
+year_positions = {year: i for i, year in enumerate(census.years)}
+year_colors = ["red", "blue", "orange", "magenta"]
+
+@instrumented
+def dwelling_types_by_year():
+    @instrumented(name="dwelling_types_by_year:update")
+    def plot(year):
+        i = year_positions[year]
+        dwelling_units = pd.Series(dwelling_units_by_year[i], index=dwelling_types)
+        return create_bar_chart(dwelling_units, f"Dwelling Types in Toronto in {year}", str(year), "Dwelling Type Units", year_colors[i % len(year_colors)])
+    hv = hvplot()
+    return hv.DynamicMap(plot, kdims='year').redim.values(year=census.years)
+
+# Past the level-of-detail threshold the facet bar shows one page of neighbourhoods
+facet_pages = page_count(len(census.neighbourhood_rows)) if level_of_detail else 1
+
+@instrumented
+@cached_figure(version=lambda: census.version)
+def average_house_value_snapshot(page=1):
+    title = "Average House Values in Toronto per Neighbourhood"
+    if level_of_detail:
+        names, positions = neighbourhood_page(census.neighbourhood_rows, page)
+        avg_house_value_by_year = to_data.iloc[positions].loc[:,['neighbourhood', 'average_house_value']].reset_index()
+        title += f" ({names[0]} to {names[-1]}, page {page} of {facet_pages})"
+    else:
+        avg_house_value_by_year = to_data.loc[:,['neighbourhood', 'average_house_value']].reset_index()
+    # Plotly treats unsigned integer columns as discrete colors (one trace per bar)
+    avg_house_value_by_year = avg_house_value_by_year.astype({'average_house_value': 'int64'})
+
+    px = plotly_express()
+    with figure_construction():
+        return px.bar(avg_house_value_by_year, x="neighbourhood", y="average_house_value", color="average_house_value", facet_row="year", width=1700, height=1200, title=title, labels={
+                         "neighbourhood": "Neighbourhood",
+                         "average_house_value": "Avg. House Value",
+                         "average_house_value": "Avg. House Value"
+                     })
 
     # YOUR CODE HERE!
 
-def top_most_expensive_neighbourhoods():
-    top_10_neighbourhoods_avg = neighbourhoods_value_avg.nlargest(10, 'average_house_value')
-    return top_10_neighbourhoods_avg.hvplot.bar(title="Top 10 Expensive Neighbourhoods in Toronto", xlabel="Neighbourhood", ylabel="Avg. House Value", yformatter='$%.2f', rot=90, width=1000, height=600)
+@instrumented
+def top_most_expensive_neighbourhoods(n=10):
+    top_10_neighbourhoods_avg = census.rankings.top_overall('average_house_value', n)
+    hvplot()
+    with figure_construction():
+        return top_10_neighbourhoods_avg.hvplot.bar(title=f"Top {n} Expensive Neighbourhoods in Toronto", xlabel="Neighbourhood", ylabel="Avg. House Value", yformatter='$%.2f', rot=90, width=1000, height=600)
     # YOUR CODE HERE!
 
-def sunburts_cost_analysis():
-    sunburst_data = to_data.loc[:,['neighbourhood','shelter_costs_owned']].reset_index()
-    sunburst_data = sunburst_data.sort_values('shelter_costs_owned',ascending = False).groupby(by=['year'])
-    return px.sunburst(sunburst_data.head(10), path=['year', 'neighbourhood'], values='shelter_costs_owned', color='shelter_costs_owned',height=800,width=1200, title='Cost Analysis of Most Expensive Neighbourhoods in Toronto per Year')
+@instrumented
+@cached_figure(version=lambda: census.version)
+def sunburts_cost_analysis(n=10):
+    sunburst_data = census.rankings.top_by_year('shelter_costs_owned', n)
+    px = plotly_express()
+    with figure_construction():
+        return px.sunburst(sunburst_data, path=['year', 'neighbourhood'], values='shelter_costs_owned', color='shelter_costs_owned',height=800,width=1200, title='Cost Analysis of Most Expensive Neighbourhoods in Toronto per Year')
     
     # YOUR CODE HERE!
 
+# Rental investment metrics (see investment_metrics.py) of every neighbourhood in a census year
+@instrumented
+def investment_metrics_table(year):
+    metrics = census.investment_metrics
+    return metrics[metrics.index == year].reset_index(drop=True).astype({'neighbourhood': str}).round(2)
+
+# Monte Carlo projections of buying a rental dwelling in every neighbourhood (see
+# cash_flow_simulator.py); the percentages come from the dashboard's sliders
+@instrumented
+def cash_flow_simulation(scenarios, years, down_payment_pct, mortgage_rate_pct, vacancy_pct):
+    params = SimulationParameters(scenarios=scenarios, years=years, down_payment=down_payment_pct / 100,
+                                  mortgage_rate=mortgage_rate_pct / 100, vacancy=vacancy_pct / 100)
+    results = simulate(simulation_inputs(to_data), params).reset_index().astype({'neighbourhood': str}).round(3)
+    summary = pn.pane.Markdown(f'{scenarios:,} scenarios over {years} years: the median neighbourhood returns {results["return_p50_pct"].median():.1f}% a year on the down payment, and loses money in {results["loss_probability"].median():.1%} of scenarios.')
+    table = pn.widgets.Tabulator(results, show_index=False, disabled=True, pagination='remote', page_size=25,
+                                 sorters=[{'field': 'return_p50_pct', 'dir': 'desc'}], sizing_mode='stretch_width')
+    return pn.Column(summary, table, sizing_mode='stretch_width')
+
 
 # ## Panel Dashboard
 # 
@@ -183,33 +375,115 @@ def sunburts_cost_analysis():
 
 # Create a Title for the Dashboard
 # YOUR CODE HERE!
-title_row = pn.pane.Markdown('# Real Estate Analysis of Toronto from 2001 to 2016')
+title_row = pn.pane.Markdown(f'# Real Estate Analysis of Toronto from {census.years[0]} to {census.years[-1]}')
 
-# Define a welcome text
-# YOUR CODE HERE!
-welcome_tab = pn.Column('#### This dashboard presents a visual analysis of historical house values, dwelling types per neighbourhood and dwelling costs in Toronto, Ontario according to census data from 2001 to 2016.You can navigate through the tabs above to explore more details about the evolution of the real estate market on the 6 across these years.', neighbourhood_map())
+# Panes are built in a thread pool while a placeholder is shown (see async_panes.py), so
+# a slow pane never holds up the server's event loop and the other sessions on it. Set
+# DASHBOARD_ASYNC_PANES=0 to build them inline.
+async_panes = os.getenv("DASHBOARD_ASYNC_PANES", "1") != "0"
 
-# Create a tab layout for the dashboard
+def pane(fn, *args):
+    if async_panes:
+        return async_pane(fn, *args)
+    if any(isinstance(arg, (pn.widgets.Widget, param.Parameter)) for arg in args):
+        return pn.bind(fn, *args)
+    return fn(*args)
+
+# Define a welcome text
 # YOUR CODE HERE!
-tabs = pn.Tabs(("Welcome", welcome_tab))
+def welcome_tab():
+    return pn.Column(f'#### This dashboard presents a visual analysis of historical house values, dwelling types per neighbourhood and dwelling costs in Toronto, Ontario according to census data from {census.years[0]} to {census.years[-1]}.You can navigate through the tabs above to explore more details about the evolution of the real estate market on the 6 across these years.', pane(neighbourhood_explorer))
 
 # Create the main dashboard
 # YOUR CODE HERE!
-yearly_analysis_row1 = pn.Row(create_bar_chart(no_of_dwelling_by_year.loc[2001], "Dwelling Types in Toronto in 2001", "2001", "Dwelling Type Units", "red"),create_bar_chart(no_of_dwelling_by_year.loc[2006], "Dwelling Types in Toronto in 2006", "2006", "Dwelling Type Units", "blue"))
-yearly_analysis_row2 = pn.Row(create_bar_chart(no_of_dwelling_by_year.loc[2011], "Dwelling Types in Toronto in 2011", "2011", "Dwelling Type Units", "orange"),create_bar_chart(no_of_dwelling_by_year.loc[2016], "Dwelling Types in Toronto in 2016", "2016", "Dwelling Type Units", "magenta"))
-yearly_market_analysis_tab = pn.Column(yearly_analysis_row1, yearly_analysis_row2)
-
-cost_value_comparison_tab = pn.Column(create_line_chart(monthly_avg_costs_by_year["shelter_costs_owned"], "Average Monthly Shelter Cost for Owned Dwellings in Toronto", "Year", "Avg Monthly Shelter Costs", "blue"),create_line_chart(monthly_avg_costs_by_year["shelter_costs_rented"], "Average Monthly Shelter Cost for Rented Dwellings in Toronto", "Year", "Avg Monthly Shelter Costs", "orange"),average_house_value())
+def yearly_market_analysis_tab():
+    return pn.panel(pane(dwelling_types_by_year))
+
+# The charts for each toggle value are built once per server process and data version and
+# shared by every session; only the toggle is built per session.
+def cost_value_charts(data):
+    def build():
+        return pn.Column(shelter_costs_chart("shelter_costs_owned", "Average Monthly Shelter Cost for Owned Dwellings in Toronto", "blue", data),shelter_costs_chart("shelter_costs_rented", "Average Monthly Shelter Cost for Rented Dwellings in Toronto", "orange", data),average_house_value(data))
+    return pn.state.as_cached(f"dashboard_cost_value_charts_{data}_{census.version}", build)
+
+def cost_value_comparison_tab():
+    data = pn.widgets.RadioButtonGroup(name='Data', options=data_options, value='Observed')
+    return pn.Column(data, pane(cost_value_charts, data))
+
+def neighbourhood_analysis_tab():
+    neighbourhood_analysis_column = pn.Column(pane(average_value_by_neighbourhood),pane(number_dwelling_types))
+    if facet_pages == 1:
+        return pn.Row(neighbourhood_analysis_column, pane(average_house_value_snapshot))
+    page = pn.widgets.IntSlider(name='Neighbourhood page', start=1, end=facet_pages, value=1)
+    return pn.Row(neighbourhood_analysis_column, pn.Column(page, pane(average_house_value_snapshot, page)))
+
+def expensive_neighbourhoods_tab():
+    top_n = pn.widgets.IntSlider(name='Number of neighbourhoods', start=1, end=census.rankings.capacity, value=10)
+    return pn.Column(top_n, pn.Row(pane(top_most_expensive_neighbourhoods, top_n), pane(sunburts_cost_analysis, top_n)))
+
+def investment_metrics_tab():
+    year = pn.widgets.Select(name='Census year', options=census.years, value=census.years[-1])
+    table = pn.widgets.Tabulator(investment_metrics_table(year.value), show_index=False, disabled=True, pagination='remote', page_size=25,
+                                 sorters=[{'field': 'gross_yield_pct', 'dir': 'desc'}], sizing_mode='stretch_width')
+    def update(event):
+        table.value = investment_metrics_table(event.new)
+    year.param.watch(update, 'value')
+    return pn.Column('#### Price-to-rent ratio, gross rental yield (%), yearly growth of the average house value since the previous census (%) and monthly cost of owning minus renting, per neighbourhood. Click a column header to sort.', year, table)
+
+# The simulation is re-run when a slider is released rather than on every step of a drag
+def cash_flow_simulator_tab():
+    scenarios = pn.widgets.IntSlider(name='Scenarios', start=1000, end=20000, step=1000, value=10000)
+    years = pn.widgets.IntSlider(name='Horizon (years)', start=1, end=30, value=10)
+    down_payment = pn.widgets.FloatSlider(name='Down payment (%)', start=5, end=50, step=5, value=20)
+    mortgage_rate = pn.widgets.FloatSlider(name='Mean mortgage rate (%)', start=1, end=10, step=0.25, value=5)
+    vacancy = pn.widgets.FloatSlider(name='Mean vacancy (%)', start=0, end=20, step=1, value=5)
+    sliders = [scenarios, years, down_payment, mortgage_rate, vacancy]
+    return pn.Column('#### Projected annualized return on the down payment (5th, 50th and 95th percentile over the scenarios), probability of losing money, and median and probability of a negative first-year cash flow, for buying a dwelling at the average house value of each neighbourhood and renting it out. Appreciation and rent growth follow each neighbourhood\'s census history with random market and neighbourhood shocks.',
+                     pn.Row(*sliders), pane(cash_flow_simulation, *[slider.param.value_throttled for slider in sliders]))
+
+# Pane build timings and payload sizes for this server process
+def diagnostics_tab():
+    pane_table = pn.pane.DataFrame(metrics_frame(), sizing_mode='stretch_width')
+    cache_stats = pn.pane.JSON(figure_cache.stats(), name='Figure cache')
+    refresh = pn.widgets.Button(name='Refresh')
+    def update(event):
+        pane_table.object = metrics_frame()
+        cache_stats.object = figure_cache.stats()
+    refresh.on_click(update)
+    return pn.Column('#### Pane build timings for this server process', refresh, pane_table, '#### Figure cache', cache_stats)
+
+tab_builders = {
+    "Welcome": welcome_tab,
+    "Yearly Market Analysis": yearly_market_analysis_tab,
+    "Shelter Costs Vs. House Value": cost_value_comparison_tab,
+    "Neighbourhood Analysis": neighbourhood_analysis_tab,
+    "Top Expensive Neighbourhoods": expensive_neighbourhoods_tab,
+    "Investment Metrics": investment_metrics_tab,
+    "Cash-Flow Simulator": cash_flow_simulator_tab,
+}
+
+# The Diagnostics tab is hidden unless the page is opened with ?diagnostics or
+# DASHBOARD_DIAGNOSTICS=1 is set
+if "diagnostics" in pn.state.session_args or os.getenv("DASHBOARD_DIAGNOSTICS") == "1":
+    tab_builders["Diagnostics"] = diagnostics_tab
+
+# Every tab has widgets, so tabs are built for every session, otherwise the widget values
+# would be shared between users. What they show is cached per server process and data
+# version instead: the Plotly figures in the figure cache and the shelter cost and house
+# value charts in the Panel cache, so a newly added census year is reflected in the next
+# session. In lazy mode (the default) a tab is only built the first time it is activated.
+# Set DASHBOARD_LAZY_TABS=0 to build every tab up front.
+lazy_tabs = os.getenv("DASHBOARD_LAZY_TABS", "1") != "0"
+
+def lazy_tab(name):
+    return pn.param.ParamFunction(tab_builders[name], lazy=True)
 
-neighbourhood_analysis_column = pn.Column(average_value_by_neighbourhood(),number_dwelling_types())
-neighbourhood_analysis_tab = pn.Row(neighbourhood_analysis_column, average_house_value_snapshot())
-
-expensive_neighbourhoods_tab = pn.Row(top_most_expensive_neighbourhoods(), sunburts_cost_analysis())
-
-tabs.append(("Yearly Market Analysis", yearly_market_analysis_tab))
-tabs.append(('Shelter Costs Vs. House Value', cost_value_comparison_tab))
-tabs.append(('Neighbourhood Analysis', neighbourhood_analysis_tab))
-tabs.append(('Top Expensive Neighbourhoods', expensive_neighbourhoods_tab))
+# Create a tab layout for the dashboard
+# YOUR CODE HERE!
+if lazy_tabs:
+    tabs = pn.Tabs(*[(name, lazy_tab(name)) for name in tab_builders], dynamic=True)
+else:
+    tabs = pn.Tabs(*[(name, builder()) for name, builder in tab_builders.items()])
 
 dashboard = pn.Column(title_row, tabs)
 dashboard
@@ -232,7 +506,7 @@ dashboard.servable()
 # In[ ]:
 
 
-neighbourhood_map().show()
+# neighbourhood_map().show()
 
 
 # In[ ]:
@@ -241,7 +515,7 @@ neighbourhood_map().show()
 # create_bar_chart(data, title, xlabel, ylabel, color)
 
 # # Bar chart for 2001
-create_bar_chart(no_of_dwelling_by_year.loc[2001], "Dwelling Types in Toronto in 2001", "2001", "Dwelling Type Units", "red")
+# create_bar_chart(no_of_dwelling_by_year.loc[2001], "Dwelling Types in Toronto in 2001", "2001", "Dwelling Type Units", "red")
 
 # # Bar chart for 2006
 # create_bar_chart(df_dwelling_units.loc[2006], "Dwelling Types in Toronto in 2006", "2006", "Dwelling Type Units", "blue")
@@ -264,14 +538,14 @@ create_bar_chart(no_of_dwelling_by_year.loc[2001], "Dwelling Types in Toronto in
 # # Line chart for rented dwellings
 # create_line_chart(monthly_avg_costs_by_year["shelter_costs_rented"], "Average Monthly Shelter Cost for Rented Dwellings in Toronto", "Year", "Avg Monthly Shelter Costs", "orange")
 
-create_line_chart(avg_house_value,'Average House Value in Toronto','Year','Avg. House Value','blue')
+# create_line_chart(avg_house_value,'Average House Value in Toronto','Year','Avg. House Value','blue')
 # avg_house_value.hvplot.line(title='Average House Value in Toronto', xlabel="Year", ylabel="Avg. House Value", yformatter='$%.2f')
 
 
 # In[9]:
 
 
-average_house_value()
+# average_house_value()
 
 
 # In[ ]:
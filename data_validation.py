@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Census data validation
+#
+# Checks the census file and its census year files (see `census_data.census_year_files`),
+# the coordinates and the dwelling totals, and writes a machine-readable report:
+#
+#     python data_validation.py [--output validation.json]
+#
+# - encoding: every file is UTF-8; a byte order mark is reported, since pandas strips it
+#   from the first header but the csv module and other readers see '\ufeffyear'
+# - schema: the columns of `census_data.census_dtypes`, and neighbourhood/lat/lon for the
+#   coordinates
+# - values: missing, non-numeric, fractional or negative values, values that do not fit
+#   the compact dtype the loader casts to, and values outside `plausible_ranges`
+# - keys: one row per (year, neighbourhood), and every neighbourhood present in every year
+# - join coverage: every census neighbourhood has coordinates, since the map joins on the
+#   name and an unmatched one becomes a point without a location; names that only differ
+#   in case, spacing or dashes are suggested
+# - totals: dwelling units per type and year, year files included, add up to
+#   `sum_of_dwelling_by_year.csv`, for the years both files have (other years are a warning)
+#
+# Each file is parsed once (with pyarrow's CSV reader when installed) and every check is a whole-column NumPy or pandas operation,
+# with the numeric census columns checked together as one matrix. Checks end in "pass",
+# "warn" or "fail" (or "skipped" when a file is missing), and the script exits with status
+# 1 if any check fails. The full report re-parses every file, so it runs when the Feather
+# cache is built (`python census_data.py`) and when `serve.py` starts, not on every load;
+# a census year file added later is validated on its own by `census_data.load_census_year`.
+
+import argparse
+import codecs
+import json
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from census_data import CENSUS_DATA_PATH, COORDINATES_PATH, census_dtypes, census_year_files, dwelling_types
+
+try:
+    import pyarrow
+    csv_engine = "pyarrow"  # parses the census several times faster than the default engine
+except ImportError:
+    csv_engine = "c"
+
+numeric_columns = [column for column, dtype in census_dtypes.items() if dtype != "category"]
+# Inclusive (low, high) bounds outside of which a value is reported as implausible
+plausible_ranges = {
+    **dict.fromkeys(dwelling_types, (0, 500_000)),
+    "year": (1800, 2100),
+    "average_house_value": (10_000, 20_000_000),
+    "shelter_costs_owned": (100, 20_000),
+    "shelter_costs_rented": (100, 20_000),
+}
+# Entries listed per failing column or list of names in the report; rows are 0-based
+# positions among the data rows of the census file followed by those of its year files
+examples = 10
+
+
+def result(check, status, message, **details):
+    return {"check": check, "status": status, "message": message, **({"details": details} if details else {})}
+
+
+def encoding_check(name, path):
+    # Decodes the raw file in blocks, since the pyarrow CSV reader passes invalid UTF-8
+    # through as bytes instead of failing
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    offset = 0
+    with open(path, "rb") as f:
+        bom = f.read(3)
+        try:
+            for block in [bom, *iter(lambda: f.read(1 << 20), b"")]:
+                decoder.decode(block)
+                offset += len(block)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError as error:
+            return result(f"encoding:{name}", "fail", f"not valid UTF-8 near byte {offset + error.start}: {error.reason}")
+    if bom == codecs.BOM_UTF8:
+        return result(f"encoding:{name}", "warn", "UTF-8 with a byte order mark before the first header", bom=True)
+    return result(f"encoding:{name}", "pass", "UTF-8", bom=False)
+
+
+def read_csv(name, path):
+    # The frame (None if the file cannot be read) and the encoding and parsing checks
+    encoding = encoding_check(name, path)
+    if encoding["status"] == "fail":
+        return None, [encoding]
+    try:
+        return pd.read_csv(path, engine=csv_engine), [encoding]
+    except ValueError as error:  # pandas' ParserError and pyarrow's ArrowInvalid
+        return None, [encoding, result(f"parse:{name}", "fail", str(error))]
+
+
+def schema_check(name, df, expected):
+    missing = [column for column in expected if column not in df.columns]
+    extra = [column for column in df.columns if column not in expected]
+    if missing:
+        return result(f"schema:{name}", "fail", f"missing columns: {', '.join(missing)}", missing=missing, extra=extra)
+    if extra:
+        return result(f"schema:{name}", "warn", f"unexpected columns: {', '.join(extra)}", missing=missing, extra=extra)
+    return result(f"schema:{name}", "pass", f"{len(expected)} expected columns")
+
+
+def value_checks(census):
+    columns = [column for column in numeric_columns if column in census.columns]
+    raw = census[columns]
+    numeric = raw.apply(pd.to_numeric, errors="coerce")
+    values = numeric.to_numpy(dtype=np.float64)
+    missing = raw.isna().to_numpy()
+    dtype_limits = np.array([np.iinfo(census_dtypes[column]).max for column in columns], dtype=np.float64)
+    low, high = np.array([plausible_ranges[column] for column in columns], dtype=np.float64).T
+
+    with np.errstate(invalid="ignore"):
+        problems = {
+            "missing": ("fail", missing),
+            "non_numeric": ("fail", np.isnan(values) & ~missing),
+            "fractional": ("fail", (values != np.floor(values)) & ~np.isnan(values)),
+            "negative": ("fail", values < 0),
+            "dtype_overflow": ("fail", values > dtype_limits),
+            "implausible": ("warn", ((values < low) | (values > high)) & (values >= 0)),
+        }
+    checks = []
+    for problem, (status, mask) in problems.items():
+        counts = mask.sum(axis=0)
+        found = {column: {"rows": int(count), "example_rows": np.flatnonzero(mask[:, i])[:examples].tolist()}
+                 for i, (column, count) in enumerate(zip(columns, counts)) if count}
+        if found:
+            summary = ", ".join(f"{column} ({detail['rows']})" for column, detail in found.items())
+            checks.append(result(f"values:{problem}", status, f"{problem.replace('_', ' ')} values in {summary}", columns=found))
+        else:
+            checks.append(result(f"values:{problem}", "pass", f"no {problem.replace('_', ' ')} values"))
+    return checks
+
+
+def key_checks(census):
+    # Names are checked once per distinct name and keys are compared as integer codes
+    names = census["neighbourhood"]
+    codes = names.cat.codes.to_numpy()
+    categories = names.cat.categories.astype(str)
+    stripped = categories.str.strip()
+    checks = []
+    blank = (codes < 0) | np.asarray(stripped == "")[codes]
+    padded = ~blank & np.asarray(categories != stripped)[codes]
+    if blank.any():
+        checks.append(result("keys:names", "fail", f"{blank.sum()} rows without a neighbourhood name", rows=np.flatnonzero(blank)[:examples].tolist()))
+    elif padded.any():
+        checks.append(result("keys:names", "warn", f"{padded.sum()} rows with surrounding whitespace in the neighbourhood name",
+                             names=categories[categories != stripped][:examples].tolist()))
+    else:
+        checks.append(result("keys:names", "pass", "every row has a neighbourhood name"))
+
+    # One sort of the (year, name) keys finds both repeated pairs and names per year
+    years = pd.to_numeric(census["year"], errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+    width = len(categories) + 1
+    keys, first_rows, key_rows, counts = np.unique(years * width + codes + 1, return_index=True, return_inverse=True, return_counts=True)
+    duplicated = counts[key_rows] > 1
+    if duplicated.any():
+        pairs = census.loc[duplicated, ["year", "neighbourhood"]].drop_duplicates()
+        checks.append(result("keys:duplicates", "fail", f"{len(pairs)} (year, neighbourhood) pairs appear more than once",
+                             pairs=pairs.head(examples).to_dict(orient="records")))
+    else:
+        checks.append(result("keys:duplicates", "pass", "one row per (year, neighbourhood)"))
+
+    per_year = pd.Series(years[first_rows]).value_counts().sort_index()
+    named = np.unique(keys % width)
+    neighbourhoods = np.count_nonzero(named)
+    incomplete = per_year[per_year < neighbourhoods]
+    if len(incomplete):
+        checks.append(result("keys:coverage", "warn", f"{len(incomplete)} years do not have all {neighbourhoods} neighbourhoods",
+                             neighbourhoods_per_year={int(year): int(count) for year, count in incomplete.items()}))
+    else:
+        checks.append(result("keys:coverage", "pass", f"{neighbourhoods} neighbourhoods in each of {len(per_year)} years"))
+    return checks
+
+
+def normalized_name(name):
+    return re.sub(r"[\s\-–—]+", " ", str(name)).strip().casefold()
+
+
+def join_checks(census, locations):
+    checks = []
+    lat, lon = pd.to_numeric(locations["lat"], errors="coerce"), pd.to_numeric(locations["lon"], errors="coerce")
+    bad = lat.isna() | lon.isna() | ~lat.between(-90, 90) | ~lon.between(-180, 180)
+    duplicated = locations["neighbourhood"].duplicated()
+    if bad.any() or duplicated.any():
+        checks.append(result("coordinates", "fail", f"{bad.sum()} rows with missing or out of range coordinates, {duplicated.sum()} duplicate names",
+                             bad_rows=np.flatnonzero(bad)[:examples].tolist(), duplicates=locations.loc[duplicated, "neighbourhood"].head(examples).tolist()))
+    else:
+        checks.append(result("coordinates", "pass", f"{len(locations)} neighbourhoods with valid coordinates"))
+
+    census_names = pd.Index(census["neighbourhood"].cat.remove_unused_categories().cat.categories)
+    location_names = pd.Index(locations["neighbourhood"].dropna().unique())
+    unmatched = census_names.difference(location_names)
+    unused = location_names.difference(census_names)
+    if len(unmatched):
+        # Candidates among the unused coordinates that match once case, spacing and dashes are ignored
+        candidates = pd.Series(unused, index=unused.map(normalized_name))
+        candidates = candidates[~candidates.index.duplicated()]
+        suggestions = {name: candidates.get(normalized_name(name)) for name in unmatched}
+        suggestions = {name: match for name, match in suggestions.items() if match is not None}
+        checks.append(result("join:coordinates", "fail", f"{len(unmatched)} of {len(census_names)} census neighbourhoods have no coordinates",
+                             unmatched=unmatched[:examples].tolist(), unmatched_count=len(unmatched), suggestions=dict(list(suggestions.items())[:examples])))
+    else:
+        checks.append(result("join:coordinates", "pass", f"all {len(census_names)} census neighbourhoods have coordinates"))
+    if len(unused):
+        checks.append(result("join:unused_coordinates", "warn", f"{len(unused)} coordinates rows match no census neighbourhood",
+                             unused=unused[:examples].tolist(), unused_count=len(unused)))
+    return checks
+
+
+def totals_check(census, totals):
+    if "year" not in totals.columns:
+        return result("totals", "fail", "the totals file has no year column")
+    types = [column for column in dwelling_types if column in census.columns and column in totals.columns]
+    computed = census.groupby("year")[types].sum()
+    expected = totals.set_index("year")[types]
+    missing_years = sorted(set(computed.index) ^ set(expected.index))
+    common = computed.index.intersection(expected.index)
+    difference = computed.loc[common] - expected.loc[common]
+    mismatched = difference.stack()
+    mismatched = mismatched[mismatched != 0]
+    details = dict(years_missing_from_one_file=[int(year) for year in missing_years],
+                   mismatches=[{"year": int(year), "dwelling_type": column, "census": int(computed.at[year, column]), "totals": int(expected.at[year, column])}
+                               for (year, column), _ in mismatched.head(examples).items()],
+                   mismatch_count=len(mismatched))
+    if len(mismatched):
+        return result("totals", "fail", f"{len(mismatched)} dwelling totals differ, {len(missing_years)} years in only one file", **details)
+    # A newly added census year has no totals until they are published, so years in only
+    # one of the files are not reconciled
+    if missing_years:
+        return result("totals", "warn", f"dwelling totals match for {len(common)} years and {len(types)} types, {len(missing_years)} years in only one file", **details)
+    return result("totals", "pass", f"dwelling totals match for {len(common)} years and {len(types)} types")
+
+
+def validate(census_path=CENSUS_DATA_PATH, coordinates_path=COORDINATES_PATH, totals_path=None):
+    # The totals default to sum_of_dwelling_by_year.csv next to the census file
+    if totals_path is None:
+        totals_path = Path(census_path).parent / "sum_of_dwelling_by_year.csv"
+    checks = []
+    census, file_checks = read_csv("census", census_path)
+    checks += file_checks
+    # New census years dropped next to the census file are part of the census table
+    year_paths = census_year_files(census_path)
+    for year_path in year_paths:
+        rows, file_checks = read_csv(f"census:{year_path.name}", year_path)
+        checks += file_checks
+        if census is not None and rows is not None:
+            census = pd.concat([census, rows], ignore_index=True)
+    locations, file_checks = read_csv("coordinates", coordinates_path)
+    checks += file_checks
+    totals = None
+    if Path(totals_path).exists():
+        totals, file_checks = read_csv("totals", totals_path)
+        checks += file_checks
+    else:
+        checks.append(result("totals", "skipped", f"{totals_path} does not exist"))
+
+    if census is not None:
+        checks.append(schema_check("census", census, list(census_dtypes)))
+        checks += value_checks(census)
+        if "neighbourhood" in census.columns:
+            # Factorized once for the key and join checks
+            census["neighbourhood"] = census["neighbourhood"].astype("category")
+        if {"year", "neighbourhood"} <= set(census.columns):
+            checks += key_checks(census)
+    if locations is not None:
+        checks.append(schema_check("coordinates", locations, ["neighbourhood", "lat", "lon"]))
+    if census is not None and locations is not None and "neighbourhood" in census.columns and {"neighbourhood", "lat", "lon"} <= set(locations.columns):
+        checks += join_checks(census, locations)
+    if census is not None and totals is not None and "year" in census.columns:
+        checks.append(totals_check(census, totals))
+
+    return {
+        "census_path": str(census_path),
+        "census_year_paths": [str(year_path) for year_path in year_paths],
+        "coordinates_path": str(coordinates_path),
+        "totals_path": str(totals_path),
+        "rows": None if census is None else len(census),
+        "passed": all(check["status"] != "fail" for check in checks),
+        "checks": checks,
+    }
+
+
+def failures(report):
+    return [check for check in report["checks"] if check["status"] == "fail"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate the census, coordinates and dwelling totals files")
+    parser.add_argument("--census", type=Path, default=CENSUS_DATA_PATH)
+    parser.add_argument("--coordinates", type=Path, default=COORDINATES_PATH)
+    parser.add_argument("--totals", type=Path, default=None, help="per-year dwelling totals to reconcile against (default: sum_of_dwelling_by_year.csv next to the census file)")
+    parser.add_argument("--output", type=Path, default=None, help="write the JSON report here instead of standard output")
+    args = parser.parse_args()
+
+    report = validate(args.census, args.coordinates, args.totals)
+    if args.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        args.output.write_text(json.dumps(report, indent=2))
+        for check in report["checks"]:
+            print(f"{check['status']:<8}{check['check']:<28}{check['message']}")
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Process-wide cache of serialized Plotly figures.
+#
+# Building the map, facet bar and sunburst figures (pandas prep, Plotly validation and JSON
+# serialization) dominates the cost of opening a dashboard session. Figures built through
+# `cached_figure` are stored as JSON, keyed on the function, its arguments and the data
+# version, in a least-recently-used cache bounded by total size in bytes. A cache hit
+# returns a fresh figure dict that Panel's Plotly pane renders directly, without running
+# the function or constructing a plotly Figure.
+#
+# The size limit is set with DASHBOARD_FIGURE_CACHE_MB (default 64).
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from instrumentation import figure_construction
+
+
+class FigureCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            figure_json = self._entries.get(key)
+            if figure_json is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return figure_json
+
+    def put(self, key, figure_json):
+        size = len(figure_json)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size_bytes -= len(previous)
+            self._entries[key] = figure_json
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size_bytes -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+figure_cache = FigureCache(int(float(os.getenv("DASHBOARD_FIGURE_CACHE_MB", "64")) * 2**20))
+
+
+def cached_figure(version):
+    # version is called on every lookup and returns the current data version. The key uses
+    # the function's name but not its module, because `panel serve` runs the dashboard
+    # script under a new module name for every session.
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (fn.__qualname__, args, tuple(sorted(kwargs.items())), version())
+            figure_json = figure_cache.get(key)
+            if figure_json is None:
+                figure = fn(*args, **kwargs)
+                with figure_construction():
+                    figure_json = figure.to_json()
+                figure_cache.put(key, figure_json)
+            return json.loads(figure_json)
+        return wrapper
+    return decorate
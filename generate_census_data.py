@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Synthetic census data generator
+#
+# Writes a census CSV and a matching coordinates CSV in the schema of the bundled Toronto
+# files, with any number of neighbourhoods and census years, for scale testing:
+#
+#     python generate_census_data.py --neighbourhoods 100000 --years 8 \
+#         --output Data/synthetic/synthetic_census_data.csv
+#
+# Every value is sampled from the bundled data:
+#
+# - each synthetic neighbourhood copies a real one: its name (with a `#<n>` suffix once
+#   the real names are used up), its coordinates (jittered for copies) and its first
+#   census year's dwelling counts, house value and shelter costs, scaled by random noise
+# - each following census year applies the changes between consecutive census years of a
+#   randomly drawn real neighbourhood, so the columns keep moving together
+#
+# Rows are generated and written a chunk of neighbourhoods at a time, and a chunk's rows
+# depend only on the seed and the chunk number, so memory use does not grow with the
+# output size. Rows are ordered by year like the bundled file, which means each chunk
+# is regenerated once per year.
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from census_data import CENSUS_DATA_PATH, COORDINATES_PATH, census_dtypes, dwelling_types
+
+value_columns = dwelling_types + ['average_house_value', 'shelter_costs_owned', 'shelter_costs_rented']
+
+
+def real_distributions(census_path=CENSUS_DATA_PATH, coordinates_path=COORDINATES_PATH):
+    census = pd.read_csv(census_path, encoding="utf-8-sig").sort_values(['neighbourhood', 'year'])
+    locations = pd.read_csv(coordinates_path).set_index('neighbourhood')
+    years = np.sort(census['year'].unique())
+    first_year = census[census['year'] == years[0]].set_index('neighbourhood')
+    # Changes are taken as log((x[t+1] + offset) / (x[t] + offset)) for every neighbourhood
+    # and pair of consecutive years. The column median as offset keeps small counts (a few
+    # movable dwellings) from turning into huge growth rates when applied to large ones.
+    offsets = census[value_columns].median().to_numpy(dtype=np.float64) + 1
+    values = np.log(census[value_columns].to_numpy(dtype=np.float64) + offsets)
+    same_neighbourhood = census['neighbourhood'].to_numpy()[1:] == census['neighbourhood'].to_numpy()[:-1]
+    return dict(
+        names=first_year.index.to_numpy(dtype=object),
+        profiles=first_year[value_columns].to_numpy(dtype=np.float64),
+        lat=locations.loc[first_year.index, 'lat'].to_numpy(),
+        lon=locations.loc[first_year.index, 'lon'].to_numpy(),
+        offsets=offsets,
+        log_changes=np.diff(values, axis=0)[same_neighbourhood],
+        start_year=int(years[0]),
+        year_step=int(years[1] - years[0]) if len(years) > 1 else 1,
+    )
+
+
+def neighbourhood_chunk(distributions, chunk, chunk_size, neighbourhoods, years, seed=0, jitter=0.01):
+    # Names, coordinates and values (neighbourhood x year x column) of one chunk
+    rng = np.random.default_rng([seed, chunk])
+    real_names = distributions['names']
+    positions = np.arange(chunk * chunk_size, min((chunk + 1) * chunk_size, neighbourhoods))
+    # The real neighbourhoods are used once each, in a fixed shuffled order, before any copies
+    order = np.random.default_rng([seed]).permutation(len(real_names))
+    templates = np.where(positions < len(real_names), order[np.minimum(positions, len(real_names) - 1)],
+                         rng.integers(len(real_names), size=len(positions)))
+    copies = positions >= len(real_names)
+
+    names = real_names[templates].copy()
+    names[copies] = [f"{name} #{position}" for name, position in zip(names[copies], positions[copies])]
+    lat = distributions['lat'][templates] + copies * rng.normal(0, jitter, len(positions))
+    lon = distributions['lon'][templates] + copies * rng.normal(0, jitter, len(positions))
+
+    first = distributions['profiles'][templates]
+    # One size factor for the whole neighbourhood and a little noise per column
+    noise = rng.lognormal(0, 0.25, (len(positions), 1)) * rng.lognormal(0, 0.1, first.shape)
+    offsets = distributions['offsets']
+    log_values = np.log(first * np.where(copies[:, None], noise, 1) + offsets)
+    log_changes = distributions['log_changes']
+    steps = log_changes[rng.integers(len(log_changes), size=(len(positions), years - 1))]
+    log_values = np.concatenate([log_values[:, None], log_values[:, None] + np.cumsum(steps, axis=1)], axis=1)
+    values = np.exp(log_values) - offsets
+
+    # Counts are rounded to multiples of 5 like the census, and everything fits its dtype
+    dwelling = slice(0, len(dwelling_types))
+    values[..., dwelling] = np.round(values[..., dwelling] / 5) * 5
+    limits = np.array([np.iinfo(census_dtypes[column]).max for column in value_columns])
+    values = np.clip(np.round(values), 0, limits).astype(np.int64)
+    return names, lat, lon, values
+
+
+def generate(census_output, coordinates_output, neighbourhoods, years, start_year=None, year_step=None,
+             seed=0, chunk_size=10000, distributions=None):
+    distributions = distributions or real_distributions()
+    start_year = distributions['start_year'] if start_year is None else start_year
+    year_step = distributions['year_step'] if year_step is None else year_step
+    last_year = start_year + year_step * (years - 1)
+    if neighbourhoods < 1 or years < 1:
+        raise ValueError("at least one neighbourhood and one year are required")
+    if not 0 <= start_year <= last_year <= np.iinfo(census_dtypes['year']).max:
+        raise ValueError(f"census years {start_year} to {last_year} do not fit the year column")
+    chunks = -(-neighbourhoods // chunk_size)
+
+    Path(census_output).parent.mkdir(parents=True, exist_ok=True)
+    Path(coordinates_output).parent.mkdir(parents=True, exist_ok=True)
+    with open(coordinates_output, "w", newline="") as f:
+        f.write("neighbourhood,lat,lon\n")
+        for chunk in range(chunks):
+            names, lat, lon, _ = neighbourhood_chunk(distributions, chunk, chunk_size, neighbourhoods, years, seed)
+            pd.DataFrame({'neighbourhood': names, 'lat': lat, 'lon': lon}).to_csv(f, header=False, index=False, float_format="%.8f")
+    with open(census_output, "w", newline="") as f:
+        f.write(",".join(["year", "neighbourhood", *value_columns]) + "\n")
+        for i in range(years):
+            for chunk in range(chunks):
+                names, _, _, values = neighbourhood_chunk(distributions, chunk, chunk_size, neighbourhoods, years, seed)
+                rows = pd.DataFrame(values[:, i], columns=value_columns)
+                rows.insert(0, 'neighbourhood', names)
+                rows.insert(0, 'year', start_year + i * year_step)
+                rows.to_csv(f, header=False, index=False)
+    return neighbourhoods * years
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic census and coordinates CSV sampled from the bundled data")
+    parser.add_argument("--neighbourhoods", type=int, default=1000)
+    parser.add_argument("--years", type=int, default=4, help="number of census years")
+    parser.add_argument("--start-year", type=int, help="first census year (default: the first bundled year)")
+    parser.add_argument("--year-step", type=int, help="years between censuses (default: as in the bundled data)")
+    parser.add_argument("--output", type=Path, default=Path("Data/synthetic/synthetic_census_data.csv"))
+    parser.add_argument("--coordinates-output", type=Path, help="default: synthetic_coordinates.csv next to --output")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=10000, help="neighbourhoods generated at a time")
+    args = parser.parse_args()
+
+    coordinates_output = args.coordinates_output or args.output.with_name("synthetic_coordinates.csv")
+    start = time.perf_counter()
+    try:
+        rows = generate(args.output, coordinates_output, args.neighbourhoods, args.years, args.start_year,
+                        args.year_step, args.seed, args.chunk_size)
+    except ValueError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - start
+    size_mb = Path(args.output).stat().st_size / 2**20
+    print(f"{rows} rows ({size_mb:.1f} MB) written to {args.output} in {elapsed:.1f}s, coordinates in {coordinates_output}")
+
+
+if __name__ == "__main__":
+    main()
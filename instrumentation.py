@@ -0,0 +1,189 @@
+# Build timings and payload sizes for the dashboard's pane builders.
+#
+# Pane builders decorated with `instrumented` record, for every call:
+#
+# - wall time, split into figure construction (code run inside `figure_construction()`)
+#   and data preparation (the rest); serializing a cached Plotly figure counts as figure
+#   construction
+# - the serialized payload size of the returned figure, when DASHBOARD_PROFILE_PAYLOAD=1,
+#   measured the first time each builder returns a figure for a given set of arguments
+#   (rendering and serializing the figure a second time roughly quadruples the latency
+#   of a widget change, so it is off by default)
+# - peak traced memory, when DASHBOARD_PROFILE_MEMORY=1 (this turns on tracemalloc,
+#   which slows down every allocation in the process)
+#
+# The numbers are kept per server process and exposed as a DataFrame for the dashboard's
+# Diagnostics tab, and over HTTP by `serve.py` at /metrics (Prometheus text format) and
+# /metrics.json.
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from functools import wraps
+
+import pandas as pd
+from tornado.web import RequestHandler
+
+if os.getenv("DASHBOARD_PROFILE_MEMORY") == "1":
+    tracemalloc.start()
+profile_payload = os.getenv("DASHBOARD_PROFILE_PAYLOAD") == "1"
+
+
+@dataclass
+class PaneMetrics:
+    calls: int = 0
+    wall_seconds: float = 0.0
+    prep_seconds: float = 0.0
+    figure_seconds: float = 0.0
+    max_wall_seconds: float = 0.0
+    last_wall_seconds: float = 0.0
+    payload_bytes: int = None
+    peak_memory_bytes: int = None
+
+
+_lock = threading.Lock()
+pane_metrics = {}
+# (pane, arguments) whose payload has already been measured, oldest first; the oldest
+# are forgotten past max_measured_payloads, so they may be measured again
+_measured_payloads = {}
+max_measured_payloads = 10_000
+_local = threading.local()
+
+
+@contextmanager
+def figure_construction():
+    # Attributes the enclosed time to figure construction for the pane being measured
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stack = getattr(_local, "stack", None)
+        if stack:
+            stack[-1] += time.perf_counter() - start
+
+
+def payload_bytes(result):
+    if isinstance(result, dict):
+        return len(json.dumps(result))
+    if hasattr(result, "to_json"):
+        return len(result.to_json())
+    # A HoloViews result means HoloViews has been imported already; measuring a Plotly or
+    # Panel pane should not be what loads it
+    hv = sys.modules.get("holoviews")
+    if hv is not None and isinstance(result, hv.core.Dimensioned) and not isinstance(result, hv.DynamicMap):
+        from bokeh.embed import json_item
+        return len(json.dumps(json_item(hv.render(result))))
+    return None
+
+
+def instrumented(fn=None, *, name=None):
+    def decorate(fn):
+        pane = name or fn.__qualname__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            stack = _local.__dict__.setdefault("stack", [])
+            stack.append(0.0)
+            tracing = tracemalloc.is_tracing()
+            if tracing:
+                memory_before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                wall = time.perf_counter() - start
+                figure = stack.pop()
+                if stack:
+                    # Nested panes count towards the figure construction of their parent
+                    stack[-1] += wall
+            peak = tracemalloc.get_traced_memory()[1] - memory_before if tracing else None
+
+            payload = None
+            if profile_payload:
+                key = (pane, args, tuple(sorted(kwargs.items())))
+                try:
+                    with _lock:
+                        measure_payload = key not in _measured_payloads
+                        _measured_payloads[key] = None
+                        if len(_measured_payloads) > max_measured_payloads:
+                            del _measured_payloads[next(iter(_measured_payloads))]
+                except TypeError:  # unhashable arguments
+                    measure_payload = False
+                if measure_payload:
+                    payload = payload_bytes(result)
+
+            with _lock:
+                metrics = pane_metrics.setdefault(pane, PaneMetrics())
+                metrics.calls += 1
+                metrics.wall_seconds += wall
+                metrics.figure_seconds += figure
+                metrics.prep_seconds += wall - figure
+                metrics.last_wall_seconds = wall
+                metrics.max_wall_seconds = max(metrics.max_wall_seconds, wall)
+                if payload is not None:
+                    metrics.payload_bytes = payload
+                if peak is not None:
+                    metrics.peak_memory_bytes = max(peak, metrics.peak_memory_bytes or 0)
+            return result
+        return wrapper
+    return decorate(fn) if fn is not None else decorate
+
+
+def metrics_snapshot():
+    from figure_cache import figure_cache
+
+    with _lock:
+        panes = {pane: asdict(metrics) for pane, metrics in pane_metrics.items()}
+    return {"panes": panes, "figure_cache": figure_cache.stats()}
+
+
+def metrics_frame():
+    panes = metrics_snapshot()["panes"]
+    frame = pd.DataFrame.from_dict(panes, orient="index")
+    frame.index.name = "pane"
+    return frame.sort_values("wall_seconds", ascending=False) if len(frame) else frame
+
+
+def prometheus_text():
+    snapshot = metrics_snapshot()
+    lines = []
+    pane_series = [
+        ("calls", "dashboard_pane_builds_total", "counter", "Number of times each pane was built"),
+        ("wall_seconds", "dashboard_pane_build_seconds_total", "counter", "Wall time spent building each pane"),
+        ("prep_seconds", "dashboard_pane_prep_seconds_total", "counter", "Time spent preparing data for each pane"),
+        ("figure_seconds", "dashboard_pane_figure_seconds_total", "counter", "Time spent constructing each pane's figure"),
+        ("max_wall_seconds", "dashboard_pane_build_seconds_max", "gauge", "Slowest build of each pane"),
+        ("payload_bytes", "dashboard_pane_payload_bytes", "gauge", "Serialized size of each pane's figure"),
+        ("peak_memory_bytes", "dashboard_pane_peak_memory_bytes", "gauge", "Peak traced memory while building each pane"),
+    ]
+    for field, metric, kind, description in pane_series:
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {kind}"]
+        for pane, metrics in snapshot["panes"].items():
+            if metrics[field] is not None:
+                lines.append(f'{metric}{{pane="{pane}"}} {metrics[field]}')
+    for field, value in snapshot["figure_cache"].items():
+        kind = "counter" if field in ("hits", "misses", "evictions") else "gauge"
+        metric = f"dashboard_figure_cache_{field}" + ("_total" if kind == "counter" else "")
+        lines += [f"# TYPE {metric} {kind}", f"{metric} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsHandler(RequestHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.write(prometheus_text())
+
+
+class MetricsJSONHandler(RequestHandler):
+    def get(self):
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(metrics_snapshot()))
+
+
+metrics_patterns = [(r"/metrics", MetricsHandler), (r"/metrics\.json", MetricsJSONHandler)]
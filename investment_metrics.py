@@ -0,0 +1,88 @@
+# Rental investment metrics per neighbourhood and census year.
+#
+# For every row of the census table:
+#
+# - price_to_rent: average house value / annual rent (12 x monthly rented shelter cost)
+# - gross_yield_pct: annual rent / average house value, in percent
+# - value_cagr_pct: compound annual growth of the neighbourhood's average house value since
+#   its previous census year, in percent (missing for its first year)
+# - owned_rented_spread: monthly shelter cost of owning minus renting
+#
+# Everything is computed with whole-column NumPy operations. The census columns are small
+# unsigned integers (see `census_data.census_dtypes`), so they are converted to float64
+# first; 12 x a uint16 rent, or owned minus rented costs, would otherwise wrap around.
+# Growth rates line rows up by sorting on (neighbourhood, year) once instead of grouping.
+#
+# When a later census year is appended (see `aggregates.append_rows`) only the new rows are
+# computed: their growth rate needs just each neighbourhood's latest earlier row, and the
+# rows already there keep theirs.
+
+import numpy as np
+import pandas as pd
+
+metric_columns = ['price_to_rent', 'gross_yield_pct', 'value_cagr_pct', 'owned_rented_spread']
+
+
+def growth_since(previous_years, previous_values, years, values):
+    # Growth per year of values since the given earlier values, missing where there is none
+    span = years - previous_years
+    valid = (span > 0) & (previous_values > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(valid, (values / previous_values) ** (1 / np.where(valid, span, 1)) - 1, np.nan)
+
+
+def compound_growth(codes, years, values):
+    # Growth per year of values since the previous year of the same code, in input order
+    order = np.lexsort((years, codes))
+    sorted_codes, sorted_years, sorted_values = codes[order], years[order], values[order]
+    growth = np.full(len(order), np.nan)
+    growth[1:] = np.where(sorted_codes[1:] == sorted_codes[:-1], growth_since(sorted_years[:-1], sorted_values[:-1], sorted_years[1:], sorted_values[1:]), np.nan)
+    result = np.empty_like(growth)
+    result[order] = growth
+    return result
+
+
+def metrics_frame(to_data, value_cagr):
+    value = to_data['average_house_value'].to_numpy(dtype=np.float64)
+    owned = to_data['shelter_costs_owned'].to_numpy(dtype=np.float64)
+    annual_rent = 12 * to_data['shelter_costs_rented'].to_numpy(dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_to_rent = np.where(annual_rent > 0, value / annual_rent, np.nan)
+        gross_yield = np.where(value > 0, annual_rent / value * 100, np.nan)
+    return pd.DataFrame({
+        'neighbourhood': to_data['neighbourhood'].array,
+        'price_to_rent': price_to_rent,
+        'gross_yield_pct': gross_yield,
+        'value_cagr_pct': value_cagr * 100,
+        'owned_rented_spread': owned - annual_rent / 12,
+    }, index=to_data.index)
+
+
+def investment_metrics(to_data):
+    # to_data is indexed by year with the census columns; returns one row per census row
+    years = to_data.index.to_numpy(dtype=np.float64)
+    codes, _ = pd.factorize(to_data['neighbourhood'])
+    return metrics_frame(to_data, compound_growth(codes, years, to_data['average_house_value'].to_numpy(dtype=np.float64)))
+
+
+def append_investment_metrics(metrics, to_data, added):
+    # Metrics of to_data, whose last `added` rows are new and the rest have `metrics`. The
+    # neighbourhood column must be categorical, as in the census table.
+    previous, rows = to_data.iloc[:len(to_data) - added], to_data.iloc[len(to_data) - added:]
+    previous_years = previous.index.to_numpy(dtype=np.float64)
+    years = rows.index.to_numpy(dtype=np.float64)
+    if len(previous_years) and len(years) and years.min() <= previous_years.max():
+        # Rows inserted before existing years change the growth rates of those years
+        return investment_metrics(to_data)
+    codes = to_data['neighbourhood'].cat.codes.to_numpy()
+    previous_codes, codes = codes[:len(previous)], codes[len(previous):]
+    known = previous_codes >= 0
+    # Year and house value of each neighbourhood's latest earlier row
+    latest_year = np.full(len(to_data['neighbourhood'].cat.categories), -np.inf)
+    np.maximum.at(latest_year, previous_codes[known], previous_years[known])
+    latest = known & (previous_years == latest_year[previous_codes])
+    latest_value = np.full(len(latest_year), np.nan)
+    latest_value[previous_codes[latest]] = previous['average_house_value'].to_numpy(dtype=np.float64)[latest]
+    growth = np.where(codes >= 0, growth_since(latest_year[codes], latest_value[codes], years, rows['average_house_value'].to_numpy(dtype=np.float64)), np.nan)
+    # The existing rows take the combined categories so both parts concatenate as one categorical
+    return pd.concat([metrics.assign(neighbourhood=previous['neighbourhood'].array), metrics_frame(rows, growth)])
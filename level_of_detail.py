@@ -0,0 +1,67 @@
+# Level-of-detail helpers for the dashboard's full-city map and facet bar.
+#
+# With a few hundred neighbourhoods both figures are drawn in full. Past
+# DASHBOARD_LOD_THRESHOLD neighbourhoods (default 500) the dashboard switches to:
+#
+# - a single-trace map colored on a continuous scale, whose points are merged on the
+#   server into grid cells sized for the current zoom level (`aggregate_points`); once
+#   the user zooms or pans, only the points around the viewport are sent
+#   (`viewport_bounds`)
+# - a facet bar showing one page of neighbourhoods at a time (`neighbourhood_page`)
+
+import os
+
+import numpy as np
+
+lod_threshold = int(os.getenv("DASHBOARD_LOD_THRESHOLD", "500"))
+
+# Map tiles are 256 pixels wide; points closer than this many pixels are merged
+cell_pixels = 16
+max_zoom = 20
+
+
+def needs_level_of_detail(neighbourhoods):
+    return neighbourhoods > lod_threshold
+
+
+def zoom_level(zoom):
+    # Integer zoom level used to aggregate (and cache) a map at a continuous zoom
+    return int(min(max(np.floor(zoom), 0), max_zoom))
+
+
+def aggregate_points(locations, zoom, value='average_house_value'):
+    # locations has one row per neighbourhood with lat, lon and value. Returns one row per
+    # occupied grid cell, at the mean position of its neighbourhoods, with their mean value,
+    # their count and a hover label.
+    cell = 360 / (256 * 2**zoom) * cell_pixels
+    locations = locations.dropna(subset=['lat', 'lon', value])
+    cells = locations.groupby([np.floor(locations['lat'] / cell), np.floor(locations['lon'] / cell)], sort=False)
+    points = cells.agg(lat=('lat', 'mean'), lon=('lon', 'mean'), **{value: (value, 'mean')},
+                       neighbourhoods=('neighbourhood', 'size'), first=('neighbourhood', 'first')).reset_index(drop=True)
+    points['label'] = points['first'].astype(str).where(points['neighbourhoods'] == 1, points['neighbourhoods'].astype(str) + " neighbourhoods")
+    return points.drop(columns='first')
+
+
+def page_count(neighbourhoods, page_size=lod_threshold):
+    return max(1, -(-neighbourhoods // page_size))
+
+
+def neighbourhood_page(neighbourhood_rows, page, page_size=lod_threshold):
+    # Names and sorted row positions of the neighbourhoods on a 1-based page, in the order
+    # of neighbourhood_rows
+    names = list(neighbourhood_rows)[(page - 1) * page_size:page * page_size]
+    if not names:
+        return names, np.zeros(0, dtype=np.intp)
+    return names, np.sort(np.concatenate([neighbourhood_rows[name] for name in names]))
+
+
+def viewport_bounds(corners, zoom):
+    # (south, west, north, east) around a map viewport given as [lon, lat] corners, padded
+    # by half the viewport on every side and snapped outwards to map tiles, so small pans
+    # reuse the same points (and cached figure)
+    lons, lats = zip(*corners)
+    lat_pad, lon_pad = (max(lats) - min(lats)) / 2, (max(lons) - min(lons)) / 2
+    tile = 360 / 2**zoom
+    south, north = np.floor((min(lats) - lat_pad) / tile) * tile, np.ceil((max(lats) + lat_pad) / tile) * tile
+    west, east = np.floor((min(lons) - lon_pad) / tile) * tile, np.ceil((max(lons) + lon_pad) / tile) * tile
+    return (float(south), float(west), float(north), float(east))
@@ -0,0 +1,27 @@
+# Plotting libraries, imported the first time something draws with them.
+#
+# Importing hvplot.pandas (which brings in Panel, HoloViews and Bokeh) and plotly.express
+# costs several seconds, and most code paths need at most one of them: the data and
+# aggregation modules (census_data, aggregates, streaming_aggregates, investment_metrics...)
+# need none, and a dashboard tab only needs the backend of its own panes. Pane builders call
+# these loaders instead of importing the libraries at module level. Each loader imports its
+# library once per process and returns the module; later calls are a dictionary lookup.
+
+import os
+from functools import cache
+
+
+@cache
+def plotly_express():
+    import plotly.express as px
+    # Read from the environment (or .env, loaded by the dashboard) by the time a map is drawn
+    px.set_mapbox_access_token(os.getenv("mapbox"))
+    return px
+
+
+@cache
+def hvplot():
+    # Importing hvplot.pandas registers the DataFrame.hvplot accessor; returns holoviews
+    import holoviews as hv
+    import hvplot.pandas
+    return hv
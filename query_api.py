@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Census query API
+#
+# Serves the tables behind the dashboard as JSON (or Arrow IPC) for other services:
+#
+#     python query_api.py --port 5007
+#
+# The same endpoints are served by `serve.py` next to the dashboard. Every endpoint reads
+# the aggregates from `aggregates.get_aggregates`, so it returns exactly what the dashboard
+# shows, including census years added since the server started.
+#
+#     GET /api                       data version, years, neighbourhoods and dwelling types
+#     GET /api/dwellings             dwelling units per type and year      (year, dwelling_type)
+#     GET /api/shelter-costs         mean monthly shelter costs per year   (year)
+#     GET /api/house-values          mean house value per year, or per year and neighbourhood
+#                                    when neighbourhoods are given         (year, neighbourhood)
+#     GET /api/census                census rows                           (year, neighbourhood, dwelling_type)
+#     GET /api/investment-metrics    see investment_metrics.py             (year, neighbourhood)
+#
+# Filters are query parameters, repeated for several values: `?year=2011&year=2016` (years
+# and dwelling types may also be comma-separated). Rows are looked up through the
+# per-neighbourhood and per-year row positions, not by scanning the census table.
+# `format=arrow` (or `Accept: application/vnd.apache.arrow.stream`) returns an Arrow IPC
+# stream; that needs pyarrow.
+#
+# The data only changes with its version, so the ETag of a response is a hash of the data
+# version and the normalized query. A request with a matching If-None-Match header is
+# answered with 304 Not Modified before any table is touched, and serialized responses are
+# kept in a size-bounded cache (QUERY_CACHE_MB, default 16) for other clients.
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from tornado.ioloop import IOLoop
+from tornado.web import Application, HTTPError, RequestHandler
+
+from aggregates import get_aggregates
+from census_data import dwelling_types
+from figure_cache import FigureCache
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow responses are optional
+    pa = None
+
+arrow_media_type = "application/vnd.apache.arrow.stream"
+response_cache = FigureCache(int(float(os.getenv("QUERY_CACHE_MB", "16")) * 2**20))
+
+_lock = threading.Lock()
+# data version -> {year: row positions in to_data}; investment_metrics has the same rows
+_year_rows = {}
+
+
+def year_rows(census):
+    version = census.version
+    with _lock:
+        if version not in _year_rows:
+            _year_rows.clear()
+            _year_rows[version] = {int(year): rows for year, rows in census.to_data.groupby(level=0).indices.items()}
+        return _year_rows[version]
+
+
+def row_positions(census, filters):
+    # Positions in to_data of the rows matching the year and neighbourhood filters, in order
+    positions = None
+    if filters["neighbourhood"]:
+        positions = np.sort(np.concatenate([census.neighbourhood_rows[name] for name in filters["neighbourhood"]]))
+    if filters["year"]:
+        by_year = year_rows(census)
+        in_years = np.sort(np.concatenate([by_year[year] for year in filters["year"]]))
+        positions = in_years if positions is None else np.intersect1d(positions, in_years, assume_unique=True)
+    return slice(None) if positions is None else positions
+
+
+def selected_dwelling_types(filters):
+    return filters["dwelling_type"] or dwelling_types
+
+
+def dwellings(census, filters):
+    table = census.no_of_dwelling_by_year
+    return table.loc[filters["year"] or slice(None), selected_dwelling_types(filters)]
+
+
+def shelter_costs(census, filters):
+    return census.monthly_avg_costs_by_year.loc[filters["year"] or slice(None)]
+
+
+def house_values(census, filters):
+    if filters["neighbourhood"]:
+        return census.to_data.iloc[row_positions(census, filters)][['neighbourhood', 'average_house_value']]
+    return census.avg_house_value.loc[filters["year"] or slice(None)].to_frame()
+
+
+def census_rows(census, filters):
+    columns = ['neighbourhood', *selected_dwelling_types(filters), 'average_house_value', 'shelter_costs_owned', 'shelter_costs_rented']
+    return census.to_data.iloc[row_positions(census, filters)][columns]
+
+
+def investment_metrics(census, filters):
+    return census.investment_metrics.iloc[row_positions(census, filters)]
+
+
+# endpoint -> (query, filters it accepts)
+queries = {
+    "dwellings": (dwellings, {"year", "dwelling_type"}),
+    "shelter-costs": (shelter_costs, {"year"}),
+    "house-values": (house_values, {"year", "neighbourhood"}),
+    "census": (census_rows, {"year", "neighbourhood", "dwelling_type"}),
+    "investment-metrics": (investment_metrics, {"year", "neighbourhood"}),
+}
+
+
+def parse_filters(handler, census, accepted):
+    values = {name: handler.get_query_arguments(name) for name in ("year", "neighbourhood", "dwelling_type")}
+    unsupported = [name for name, given in values.items() if given and name not in accepted]
+    if unsupported:
+        raise HTTPError(400, reason=f"Unsupported filter: {', '.join(unsupported)}")
+    split = lambda given: [value for argument in given for value in argument.split(",") if value]
+    try:
+        years = sorted({int(year) for year in split(values["year"])})
+    except ValueError:
+        raise HTTPError(400, reason="Years must be integers")
+    unknown = [str(year) for year in years if year not in year_rows(census)]
+    unknown += [name for name in values["neighbourhood"] if name not in census.neighbourhood_rows]
+    unknown += [name for name in split(values["dwelling_type"]) if name not in dwelling_types]
+    if unknown:
+        raise HTTPError(400, reason=f"Unknown filter value: {', '.join(unknown)}")
+    return {
+        "year": years,
+        "neighbourhood": sorted(set(values["neighbourhood"])),
+        "dwelling_type": [name for name in dwelling_types if name in split(values["dwelling_type"])],
+    }
+
+
+def serialize(frame, response_format):
+    frame = frame.reset_index()
+    if response_format == "arrow":
+        sink = pa.BufferOutputStream()
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return frame.to_json(orient="records").encode()
+
+
+class CensusHandler(RequestHandler):
+    def write_error(self, status_code, **kwargs):
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"error": self._reason}))
+
+
+class QueryHandler(CensusHandler):
+    def initialize(self, endpoint):
+        self.endpoint = endpoint
+
+    def response_format(self):
+        requested = self.get_query_argument("format", None)
+        if requested is None:
+            requested = "arrow" if arrow_media_type in self.request.headers.get("Accept", "") else "json"
+        if requested not in ("json", "arrow"):
+            raise HTTPError(400, reason=f"Unknown format: {requested}")
+        if requested == "arrow" and pa is None:
+            raise HTTPError(406, reason="Arrow responses need pyarrow")
+        return requested
+
+    def compute_etag(self):
+        return f'"{self.cache_key}"'
+
+    def get(self):
+        census = get_aggregates()
+        query, accepted = queries[self.endpoint]
+        filters = parse_filters(self, census, accepted)
+        response_format = self.response_format()
+        normalized = json.dumps([self.endpoint, filters, response_format])
+        self.cache_key = hashlib.sha256(f"{census.version}{normalized}".encode()).hexdigest()[:32]
+
+        self.set_header("Cache-Control", "no-cache")
+        self.set_header("X-Census-Version", census.version)
+        self.set_etag_header()
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+        body = response_cache.get(self.cache_key)
+        if body is None:
+            body = serialize(query(census, filters), response_format)
+            response_cache.put(self.cache_key, body)
+        self.set_header("Content-Type", arrow_media_type if response_format == "arrow" else "application/json")
+        self.write(body)
+
+
+class IndexHandler(CensusHandler):
+    def get(self):
+        census = get_aggregates()
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps({
+            "version": census.version,
+            "years": census.years,
+            "neighbourhoods": list(census.neighbourhood_rows),
+            "dwelling_types": dwelling_types,
+            "endpoints": {f"/api/{endpoint}": sorted(accepted) for endpoint, (_, accepted) in queries.items()},
+            "response_cache": response_cache.stats(),
+        }))
+
+
+query_patterns = [(r"/api/?", IndexHandler)] + [(rf"/api/{endpoint}", QueryHandler, {"endpoint": endpoint}) for endpoint in queries]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the census tables as JSON or Arrow")
+    parser.add_argument("--port", type=int, default=5007)
+    parser.add_argument("--address", default="localhost")
+    args = parser.parse_args()
+
+    census = get_aggregates()
+    print(f"Loaded census data version {census.version[:12]} ({len(census.to_data)} rows), serving on http://{args.address}:{args.port}/api")
+    Application(query_patterns).listen(args.port, address=args.address)
+    IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
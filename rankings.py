@@ -0,0 +1,110 @@
+# Top-N neighbourhood rankings kept up to date as census rows are appended.
+#
+# The rankings keep, for each metric:
+#
+# - the per-year top `capacity` rows (used by the sunburst chart)
+# - running per-neighbourhood sums and counts, so the all-years mean ranking (the top
+#   expensive neighbourhoods bar chart) never has to revisit earlier census years
+#
+# Selecting a top N uses np.argpartition, which is linear in the number of candidates, and
+# only the N selected values are sorted. Appending a batch of rows merges it with the
+# stored per-year tops instead of re-sorting the history.
+
+import numpy as np
+import pandas as pd
+
+ranking_metrics = ('average_house_value', 'shelter_costs_owned')
+
+
+def top_positions(values, n):
+    # Positions of the n largest values, largest first
+    if len(values) > n:
+        positions = np.argpartition(values, len(values) - n)[len(values) - n:]
+    else:
+        positions = np.arange(len(values))
+    return positions[np.argsort(-values[positions], kind='stable')]
+
+
+class TopNRanking:
+    def __init__(self, capacity=25, metrics=ranking_metrics):
+        # capacity is the largest N that can be queried
+        self.capacity = capacity
+        self.metrics = tuple(metrics)
+        self._names = pd.Index([], dtype=object)
+        self._counts = np.zeros(0)
+        self._sums = {metric: np.zeros(0) for metric in self.metrics}
+        # (metric, year) -> (values, neighbourhood codes) of the current top rows
+        self._year_tops = {}
+
+    @classmethod
+    def from_frame(cls, to_data, **kwargs):
+        ranking = cls(**kwargs)
+        ranking.append(to_data)
+        return ranking
+
+    @property
+    def years(self):
+        return sorted({year for _, year in self._year_tops})
+
+    def _encode(self, neighbourhoods):
+        names = np.asarray(neighbourhoods, dtype=object)
+        codes = self._names.get_indexer(names)
+        new_names = pd.unique(names[codes < 0])
+        if len(new_names):
+            self._names = self._names.append(pd.Index(new_names, dtype=object))
+            grow = len(new_names)
+            self._counts = np.concatenate([self._counts, np.zeros(grow)])
+            for metric in self.metrics:
+                self._sums[metric] = np.concatenate([self._sums[metric], np.zeros(grow)])
+            codes = self._names.get_indexer(names)
+        return codes
+
+    def append(self, rows):
+        # rows is indexed by year and has a neighbourhood column plus every ranked metric
+        codes = self._encode(rows['neighbourhood'].astype(str))
+        years = rows.index.to_numpy()
+        size = len(self._names)
+        self._counts += np.bincount(codes, minlength=size)
+        order = np.argsort(years, kind='stable')
+        batch_years, starts = np.unique(years[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        for metric in self.metrics:
+            values = rows[metric].to_numpy(dtype=np.float64)
+            self._sums[metric] += np.bincount(codes, weights=values, minlength=size)
+            for year, start, stop in zip(batch_years, bounds[:-1], bounds[1:]):
+                batch = order[start:stop]
+                candidate_values, candidate_codes = values[batch], codes[batch]
+                key = (metric, year.item())
+                if key in self._year_tops:
+                    top_values, top_codes = self._year_tops[key]
+                    candidate_values = np.concatenate([top_values, candidate_values])
+                    candidate_codes = np.concatenate([top_codes, candidate_codes])
+                keep = top_positions(candidate_values, self.capacity)
+                self._year_tops[key] = (candidate_values[keep], candidate_codes[keep])
+
+    def _check(self, metric, n):
+        if metric not in self._sums:
+            raise KeyError(f"{metric} is not ranked")
+        if n > self.capacity:
+            raise ValueError(f"n={n} is larger than the ranking capacity of {self.capacity}")
+
+    def top_overall(self, metric, n=10):
+        # Neighbourhoods with the highest mean value over all census years
+        self._check(metric, n)
+        means = self._sums[metric] / np.maximum(self._counts, 1)
+        positions = top_positions(means, n)
+        index = pd.Index(self._names[positions], name='neighbourhood')
+        return pd.DataFrame({metric: means[positions]}, index=index)
+
+    def top_by_year(self, metric, n=10):
+        # The n rows with the highest value in every census year
+        self._check(metric, n)
+        frames = []
+        for year in self.years:
+            values, codes = self._year_tops[(metric, year)]
+            frames.append(pd.DataFrame({
+                'year': year,
+                'neighbourhood': self._names[codes[:n]],
+                metric: values[:n],
+            }))
+        return pd.concat(frames, ignore_index=True)
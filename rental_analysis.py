@@ -9,15 +9,13 @@
 
 
 # imports with pyvizenv environment
-import panel as pn
-pn.extension('plotly')
 import plotly.express as px
-import pandas as pd
 import hvplot.pandas
 import matplotlib.pyplot as plt
 import os
-from pathlib import Path
 from dotenv import load_dotenv
+from aggregates import get_aggregates, save_dwelling_totals
+from census_data import dwelling_types
 
 
 # In[2]:
@@ -44,8 +42,9 @@ map_box_api = os.getenv("mapbox")
 
 
 # Read the census data into a Pandas DataFrame
-file_path = Path("Data/toronto_neighbourhoods_census_data.csv")
-to_data = pd.read_csv(file_path, index_col="year")
+# The yearly and per-neighbourhood aggregates used below are computed along with it
+census = get_aggregates()
+to_data = census.to_data
 to_data.head()
 
 
@@ -64,8 +63,7 @@ to_data.head()
 
 # Calculate the sum number of dwelling types units per year (hint: use groupby)
 # YOUR CODE HERE!
-dwelling_types = ['single_detached_house', 'apartment_five_storeys_plus','movable_dwelling', 'semi_detached_house','row_house', 'duplex','apartment_five_storeys_less','other_house']
-no_of_dwelling_by_year = to_data.loc[:,dwelling_types].groupby(by='year').sum()
+no_of_dwelling_by_year = census.no_of_dwelling_by_year
 no_of_dwelling_by_year.head()
 
 index_list = no_of_dwelling_by_year.index.values.tolist()
@@ -77,7 +75,8 @@ index_list = no_of_dwelling_by_year.index.values.tolist()
 # Save the dataframe as a csv file
 # YOUR CODE HERE!
 
-no_of_dwelling_by_year.to_csv('Data/sum_of_dwelling_by_year.csv')
+# Only the years not already in the file are appended
+save_dwelling_totals(no_of_dwelling_by_year, 'Data/sum_of_dwelling_by_year.csv')
 
 
 # In[15]:
@@ -98,21 +97,11 @@ def create_bar_chart(data, title, xlabel, ylabel, color):
 # Create a bar chart per year to show the number of dwelling types
 
 ylabel = "Dwelling type Units"
-# Bar chart for 2001
+bar_colors = ["red", "blue", "orange", "purple"]
+# One bar chart per census year, with a direct row lookup for each year
 # YOUR CODE HERE!
-create_bar_chart(no_of_dwelling_by_year[no_of_dwelling_by_year.index == index_list[0]].iloc[0], "Dwelling Types in Toronto in " + str(index_list[0]), index_list[0], ylabel, "red")
-
-# Bar chart for 2006
-# YOUR CODE HERE!
-create_bar_chart(no_of_dwelling_by_year[no_of_dwelling_by_year.index == index_list[1]].iloc[0], "Dwelling Types in Toronto in " + str(index_list[1]), index_list[1], ylabel, "blue")
-
-# Bar chart for 2011
-# YOUR CODE HERE!
-create_bar_chart(no_of_dwelling_by_year[no_of_dwelling_by_year.index == index_list[2]].iloc[0], "Dwelling Types in Toronto in " + str(index_list[2]), index_list[2], ylabel, "orange")
-
-# Bar chart for 2016
-# YOUR CODE HERE!
-create_bar_chart(no_of_dwelling_by_year[no_of_dwelling_by_year.index == index_list[3]].iloc[0], "Dwelling Types in Toronto in " + str(index_list[3]), index_list[3], ylabel, "purple")
+for i, year in enumerate(index_list):
+    create_bar_chart(no_of_dwelling_by_year.loc[year], "Dwelling Types in Toronto in " + str(year), year, ylabel, bar_colors[i % len(bar_colors)])
 
 
 # - - - 
@@ -128,7 +117,7 @@ create_bar_chart(no_of_dwelling_by_year[no_of_dwelling_by_year.index == index_li
 
 # Calculate the average monthly shelter costs for owned and rented dwellings
 # YOUR CODE HERE!
-monthly_avg_costs_by_year = to_data.loc[:,['shelter_costs_owned','shelter_costs_rented']].groupby(by='year').mean()
+monthly_avg_costs_by_year = census.monthly_avg_costs_by_year
 monthly_avg_costs_by_year
 
 
@@ -164,7 +153,7 @@ plot_owned + plot_rented
 
 # Calculate the average house value per year
 # YOUR CODE HERE!
-avg_house_value = to_data['average_house_value'].groupby(by='year').mean()
+avg_house_value = census.avg_house_value
 avg_house_value
 
 
@@ -235,8 +224,8 @@ no_of_dwelling_types_per_year_by_neighbourhood.hvplot.bar(groupby='neighbourhood
 
 # Getting the data from the top 10 expensive neighbourhoods
 # YOUR CODE HERE!
-neighbourhoods_value_avg = avg_house_value_by_neighbourhood.reset_index().drop(columns=['year']).groupby(['neighbourhood']).mean()
-top_10_neighbourhoods_avg = neighbourhoods_value_avg.nlargest(10, 'average_house_value')
+neighbourhoods_value_avg = census.neighbourhoods_value_avg
+top_10_neighbourhoods_avg = census.rankings.top_overall('average_house_value', 10)
 top_10_neighbourhoods_avg
 
 
@@ -260,9 +249,7 @@ top_10_neighbourhoods_avg.hvplot.bar(title="Top 10 Expensive Neighbourhoods in T
 
 
 # Load neighbourhoods coordinates data
-file_path = Path("Data/toronto_neighbourhoods_coordinates.csv")
-df_neighbourhood_locations = pd.read_csv(file_path)
-df_neighbourhood_locations.set_index('neighbourhood', inplace=True)
+df_neighbourhood_locations = census.locations
 df_neighbourhood_locations.head()
 
 
@@ -288,8 +275,7 @@ neighbourhoods_value_avg.head()
 
 # Join the average values with the neighbourhood locations
 # YOUR CODE HERE!
-neighbourhood_avg_value_with_location = pd.concat([df_neighbourhood_locations, neighbourhoods_value_avg], axis=1)
-neighbourhood_avg_value_with_location = neighbourhood_avg_value_with_location.reset_index()
+neighbourhood_avg_value_with_location = census.neighbourhood_value_locations
 neighbourhood_avg_value_with_location.head()
 
 
@@ -331,7 +317,9 @@ map_plot.show()
 
 
 # YOUR CODE HERE!
-avg_house_value_by_year = to_data.loc[:,['neighbourhood', 'average_house_value']].reset_index()
+# Plotly treats unsigned integer columns as discrete colors (one trace per bar), so the
+# compact uint32 house values are widened for plotting
+avg_house_value_by_year = to_data.loc[:,['neighbourhood', 'average_house_value']].reset_index().astype({'average_house_value': 'int64'})
 
 px.bar(avg_house_value_by_year, x="neighbourhood", y="average_house_value", color="average_house_value", facet_row="year", width=1700, height=1200, title="Average House Values in Toronto per Neighbourhood", labels={
                      "neighbourhood": "Neighbourhood",
@@ -347,8 +335,7 @@ px.bar(avg_house_value_by_year, x="neighbourhood", y="average_house_value", colo
 
 # Fetch the data from all expensive neighbourhoods per year.
 # YOUR CODE HERE!
-sunburst_data = to_data.loc[:,['neighbourhood','shelter_costs_owned']].reset_index()
-sunburst_data = sunburst_data.sort_values('shelter_costs_owned',ascending = False).groupby(by=['year'])
+sunburst_data = census.rankings.top_by_year('shelter_costs_owned', 10)
 sunburst_data.head()
 
 
@@ -357,7 +344,7 @@ sunburst_data.head()
 
 # Create the sunburst chart
 # YOUR CODE HERE!
-px.sunburst(sunburst_data.head(10), path=['year', 'neighbourhood'], values='shelter_costs_owned', color='shelter_costs_owned',height=800,width=1200, title='Cost Analysis of Most Expensive Neighbourhoods in Toronto per Year')
+px.sunburst(sunburst_data, path=['year', 'neighbourhood'], values='shelter_costs_owned', color='shelter_costs_owned',height=800,width=1200, title='Cost Analysis of Most Expensive Neighbourhoods in Toronto per Year')
 
 
 # In[ ]:
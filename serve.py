@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# # Multi-process dashboard server
+#
+# Serves `dashboard.py` from several worker processes listening on the same port:
+#
+#     python serve.py --workers 4 --port 5006
+#
+# Before forking the workers this script refreshes the Feather cache of the census files
+# (see `census_data.py`) and loads the census data and every aggregate once. The workers
+# are forked from this process, so they start with the data already loaded. The census
+# columns are read-only views of the memory-mapped cache file, so their pages are shared
+# by all workers through the OS page cache instead of being copied into each one. The
+# smaller derived tables are inherited copy-on-write.
+#
+# Pane build metrics are served at /metrics (Prometheus text) and /metrics.json. Each
+# worker keeps its own metrics, so a scrape reports the worker that answered it. The census
+# query API (see `query_api.py`) is served under /api.
+#
+# The census files are validated along with the cache refresh (see `data_validation.py`);
+# failed checks are reported as warnings and do not stop the server.
+
+import argparse
+import os
+import warnings
+
+import panel as pn
+
+from aggregates import get_aggregates
+from census_data import CENSUS_DATA_PATH, COORDINATES_PATH, build_columnar_cache, census_dtypes, columnar_cache_is_fresh, feather
+from data_validation import failures, validate
+from instrumentation import metrics_patterns
+from query_api import query_patterns
+
+
+def prepare_shared_data():
+    for check in failures(validate(CENSUS_DATA_PATH, COORDINATES_PATH)):
+        warnings.warn(f"{CENSUS_DATA_PATH}: {check['check']}: {check['message']}")
+    if feather is not None:
+        for csv_path, dtypes in ((CENSUS_DATA_PATH, census_dtypes), (COORDINATES_PATH, None)):
+            if not columnar_cache_is_fresh(csv_path):
+                build_columnar_cache(csv_path, dtypes)
+    return get_aggregates()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard from several worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: one per CPU)")
+    parser.add_argument("--port", type=int, default=5006)
+    parser.add_argument("--address", default=None)
+    parser.add_argument("--allow-websocket-origin", action="append", default=None, help="host allowed to open the websocket; repeat for several")
+    args = parser.parse_args()
+
+    census = prepare_shared_data()
+    print(f"Loaded census data version {census.version[:12]} ({len(census.to_data)} rows), starting {args.workers} workers on port {args.port}")
+    pn.serve({"dashboard": "dashboard.py"}, port=args.port, address=args.address, websocket_origin=args.allow_websocket_origin,
+             num_procs=args.workers, show=False, title="Toronto Dwellings Analysis", extra_patterns=metrics_patterns + query_patterns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Grid index over neighbourhood coordinates for viewport, radius and nearest queries.
+#
+# Points are bucketed into square lat/lon cells and stored sorted by cell, so the points
+# of a row of cells are one contiguous slice. A bounding-box query reads one slice per
+# row of cells it overlaps and filters the edges. Radius queries search the bounding box
+# of the circle and keep points whose great-circle distance is within the radius;
+# k-nearest queries widen a radius search until it holds k points. The index is built
+# once per data version (see `aggregates.CensusAggregates.spatial_index`) and is
+# read-only afterwards.
+#
+# Queries return row positions into the table the index was built from. Longitudes are
+# not wrapped around the antimeridian.
+
+import numpy as np
+
+earth_radius_km = 6371.0088
+km_per_degree = np.pi * earth_radius_km / 180
+
+
+def haversine_km(lat, lon, lats, lons):
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2)**2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2)**2
+    return 2 * earth_radius_km * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+class SpatialIndex:
+    def __init__(self, lat, lon, rows=None, points_per_cell=4):
+        lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+        rows = np.arange(len(lat)) if rows is None else np.asarray(rows)
+        self.lat_min, self.lon_min = (lat.min(), lon.min()) if len(lat) else (0.0, 0.0)
+        # Square cells sized for about points_per_cell points each on average
+        extent = max(lat.max() - self.lat_min, 1e-9) * max(lon.max() - self.lon_min, 1e-9) if len(lat) else 1.0
+        self.cell = max(np.sqrt(extent * points_per_cell / max(len(lat), 1)), 1e-6)
+        self.cell_rows = int((lat.max() - self.lat_min) // self.cell) + 1 if len(lat) else 1
+        self.cell_columns = int((lon.max() - self.lon_min) // self.cell) + 1 if len(lat) else 1
+
+        cells = self._cell_row(lat) * self.cell_columns + self._cell_column(lon)
+        order = np.argsort(cells, kind='stable')
+        self._cells = cells[order]
+        self.lat, self.lon, self.rows = lat[order], lon[order], rows[order]
+
+    @classmethod
+    def from_frame(cls, table, **kwargs):
+        # Indexes the rows of table (with lat and lon columns) that have coordinates
+        valid = table['lat'].notna().to_numpy() & table['lon'].notna().to_numpy()
+        return cls(table['lat'].to_numpy()[valid], table['lon'].to_numpy()[valid], np.flatnonzero(valid), **kwargs)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _cell_row(self, lat):
+        return np.clip(((np.asarray(lat) - self.lat_min) // self.cell).astype(np.int64), 0, self.cell_rows - 1)
+
+    def _cell_column(self, lon):
+        return np.clip(((np.asarray(lon) - self.lon_min) // self.cell).astype(np.int64), 0, self.cell_columns - 1)
+
+    def _bbox_candidates(self, south, west, north, east):
+        # Index positions of every point in the cells overlapping the box
+        first_row, last_row = self._cell_row(south), self._cell_row(north)
+        first_column, last_column = self._cell_column(west), self._cell_column(east)
+        row_cells = np.arange(first_row, last_row + 1) * self.cell_columns
+        starts = np.searchsorted(self._cells, row_cells + first_column, side='left')
+        stops = np.searchsorted(self._cells, row_cells + last_column, side='right')
+        if not len(starts):
+            return np.zeros(0, dtype=np.intp)
+        lengths = stops - starts
+        # Concatenated ranges starts[i]:stops[i]
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        return np.arange(lengths.sum()) + offsets
+
+    def _within_bbox(self, south, west, north, east):
+        if not len(self) or south > north or west > east:
+            return np.zeros(0, dtype=np.intp)
+        candidates = self._bbox_candidates(south, west, north, east)
+        lat, lon = self.lat[candidates], self.lon[candidates]
+        return candidates[(lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)]
+
+    def within_bbox(self, south, west, north, east):
+        # Rows with south <= lat <= north and west <= lon <= east
+        return self.rows[self._within_bbox(south, west, north, east)]
+
+    def _within_radius(self, lat, lon, km):
+        lat_span = km / km_per_degree
+        # Widest longitude span of the circle, at its edge closest to a pole
+        cos_lat = np.cos(np.radians(min(abs(lat) + lat_span, 89.9)))
+        lon_span = km / (km_per_degree * cos_lat)
+        candidates = self._within_bbox(lat - lat_span, lon - lon_span, lat + lat_span, lon + lon_span)
+        distances = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+        keep = distances <= km
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return candidates[order], distances[order]
+
+    def within_radius(self, lat, lon, km):
+        # Rows within km of (lat, lon) and their distances, nearest first
+        positions, distances = self._within_radius(lat, lon, km)
+        return self.rows[positions], distances
+
+    def nearest(self, lat, lon, k=1):
+        # The k rows nearest to (lat, lon) and their distances, nearest first
+        k = min(k, len(self))
+        if k == 0:
+            return self.rows[:0], np.zeros(0)
+        # Start from the radius expected to hold k points and double it until it does
+        km = self.cell * km_per_degree * max(np.sqrt(k), 1)
+        while True:
+            positions, distances = self._within_radius(lat, lon, km)
+            if len(positions) >= k or km > np.pi * earth_radius_km:
+                return self.rows[positions[:k]], distances[:k]
+            km *= 2
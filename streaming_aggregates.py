@@ -0,0 +1,135 @@
+# Single-pass aggregation of census files that do not fit in memory.
+#
+# `aggregates.compute_aggregates` needs the whole census table as one DataFrame. This
+# module reads the census CSV (or its Feather cache) in chunks instead and accumulates
+# exact integer sums and row counts per year and per neighbourhood, from which it builds
+# the same derived tables as `aggregates.derived_tables`, with the same index, dtypes and
+# values:
+#
+#     from streaming_aggregates import stream_derived_tables
+#     tables = stream_derived_tables("Data/synthetic/synthetic_census_data.csv")
+#     tables["no_of_dwelling_by_year"]
+#
+# Means are computed as sum / count from integer sums, which is what pandas' groupby mean
+# gives for integer columns. Memory is bounded by the chunk size plus one accumulator per
+# year and per neighbourhood, whatever the number of rows.
+
+import numpy as np
+import pandas as pd
+
+from census_data import CENSUS_DATA_PATH, apply_dtypes, census_dtypes, columnar_cache_is_fresh, columnar_cache_path, dwelling_types
+
+try:
+    import pyarrow as pa
+    from pyarrow import ipc
+except ImportError:  # chunks are read from the CSV without pyarrow
+    pa = None
+
+cost_columns = ['shelter_costs_owned', 'shelter_costs_rented']
+year_sum_columns = dwelling_types + cost_columns + ['average_house_value']
+numeric_dtypes = {column: dtype for column, dtype in census_dtypes.items() if dtype != "category"}
+
+
+def census_chunks(path=CENSUS_DATA_PATH, chunksize=100_000):
+    # Feather caches are read one record batch at a time (64k rows as written by
+    # `census_data.build_columnar_cache`), CSVs `chunksize` rows at a time
+    if pa is not None and columnar_cache_is_fresh(path):
+        with pa.memory_map(str(columnar_cache_path(path))) as source:
+            reader = ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i).to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+def encode(index, values):
+    # Codes of values in index, appending the values it does not contain yet
+    codes = index.get_indexer(values)
+    new_values = pd.unique(values[codes < 0])
+    if len(new_values):
+        index = index.append(pd.Index(new_values, dtype=index.dtype))
+        codes = index.get_indexer(values)
+    return index, codes
+
+
+def grow(array, size):
+    # Pads an accumulator with zero rows up to size
+    padding = np.zeros((size - len(array),) + array.shape[1:], dtype=array.dtype)
+    return np.concatenate([array, padding])
+
+
+def downcast_sums(sums, dtypes):
+    # pandas keeps a column's integer dtype for groupby sums that fit in it
+    return sums.astype({column: dtype for column, dtype in dtypes.items() if sums[column].max() <= np.iinfo(dtype).max})
+
+
+class CensusAccumulator:
+    def __init__(self):
+        self._years = pd.Index([], dtype=census_dtypes['year'])
+        self._neighbourhoods = pd.Index([], dtype=object)
+        self._year_sums = np.zeros((0, len(year_sum_columns)), dtype=np.uint64)
+        self._year_counts = np.zeros(0, dtype=np.int64)
+        self._neighbourhood_sums = np.zeros(0, dtype=np.uint64)
+        self._neighbourhood_counts = np.zeros(0, dtype=np.int64)
+
+    def _neighbourhood_codes(self, neighbourhoods):
+        # Chunks read from the Feather cache are categorical; only their categories are looked up
+        if isinstance(neighbourhoods.dtype, pd.CategoricalDtype):
+            local_codes, local_names = neighbourhoods.cat.codes.to_numpy(), neighbourhoods.cat.categories
+        else:
+            local_codes, local_names = pd.factorize(neighbourhoods)
+        if (local_codes < 0).any():
+            raise ValueError("rows without a neighbourhood")
+        self._neighbourhoods, codes = encode(self._neighbourhoods, np.asarray(local_names, dtype=object))
+        return codes[local_codes]
+
+    def add(self, chunk):
+        # chunk has the census columns, with the year as a column or as the index
+        if 'year' not in chunk.columns:
+            chunk = chunk.reset_index()
+        chunk = apply_dtypes(chunk.loc[:, list(census_dtypes)], numeric_dtypes)
+        self._years, year_codes = encode(self._years, chunk['year'].to_numpy())
+        neighbourhood_codes = self._neighbourhood_codes(chunk['neighbourhood'])
+        self._year_sums = grow(self._year_sums, len(self._years))
+        self._year_counts = grow(self._year_counts, len(self._years))
+        self._neighbourhood_sums = grow(self._neighbourhood_sums, len(self._neighbourhoods))
+        self._neighbourhood_counts = grow(self._neighbourhood_counts, len(self._neighbourhoods))
+
+        year_sums = chunk[year_sum_columns].groupby(year_codes).sum()
+        self._year_sums[year_sums.index] += year_sums.to_numpy(dtype=np.uint64)
+        year_counts = chunk.groupby(year_codes).size()
+        self._year_counts[year_counts.index] += year_counts.to_numpy()
+        by_neighbourhood = chunk['average_house_value'].groupby(neighbourhood_codes).agg(['sum', 'size'])
+        self._neighbourhood_sums[by_neighbourhood.index] += by_neighbourhood['sum'].to_numpy(dtype=np.uint64)
+        self._neighbourhood_counts[by_neighbourhood.index] += by_neighbourhood['size'].to_numpy()
+
+    def tables(self):
+        # The tables of `aggregates.derived_tables`, as if computed from all rows added so far
+        year_order = np.argsort(self._years.to_numpy(), kind='stable')
+        year_index = pd.Index(self._years[year_order], name='year')
+        sums = pd.DataFrame(self._year_sums[year_order], index=year_index, columns=year_sum_columns)
+        year_counts = pd.Series(self._year_counts[year_order], index=year_index)
+        means = sums[cost_columns + ['average_house_value']].div(year_counts, axis=0)
+
+        names = self._neighbourhoods.to_numpy()
+        neighbourhood_order = np.argsort(names, kind='stable')
+        categories = pd.Index(names[neighbourhood_order])
+        neighbourhood_index = pd.CategoricalIndex(categories, categories=categories, name='neighbourhood')
+        neighbourhood_counts = pd.Series(self._neighbourhood_counts[neighbourhood_order], index=neighbourhood_index)
+        neighbourhood_means = self._neighbourhood_sums[neighbourhood_order] / neighbourhood_counts.to_numpy()
+
+        return dict(
+            no_of_dwelling_by_year=downcast_sums(sums[dwelling_types], {column: census_dtypes[column] for column in dwelling_types}),
+            monthly_avg_costs_by_year=means[cost_columns],
+            avg_house_value=means['average_house_value'],
+            neighbourhoods_value_avg=pd.DataFrame({'average_house_value': neighbourhood_means}, index=neighbourhood_index),
+            year_counts=year_counts,
+            neighbourhood_counts=neighbourhood_counts,
+        )
+
+
+def stream_derived_tables(path=CENSUS_DATA_PATH, chunksize=100_000):
+    accumulator = CensusAccumulator()
+    for chunk in census_chunks(path, chunksize):
+        accumulator.add(chunk)
+    return accumulator.tables()
@@ -0,0 +1,187 @@
+# Yearly estimates of the census metrics between census years.
+#
+# The census only has a value every five years. For every neighbourhood and metric the
+# census values are fitted with a piecewise cubic Hermite interpolant (PCHIP, as in
+# scipy.interpolate.PchipInterpolator) or with straight lines between census years, and
+# evaluated at every year from the first to the last census year. PCHIP goes through the
+# census values, is smooth and never overshoots them, so counts do not go negative and a
+# value that rose between two census years does not dip in between.
+#
+# All neighbourhoods share the same census years, so the table is laid out as one
+# (neighbourhoods x census years x metrics) array and every step is a NumPy operation over
+# the whole array. The slopes at the census years are computed for all neighbourhoods and
+# metrics at once, and a fit's value in a year is a fixed weighted sum of the values and
+# slopes at the census years, so all years are evaluated with two matrix products of
+# (years x census years) weights with the array. A census value missing between two
+# known ones is filled in linearly before the fit; years before a neighbourhood's first or
+# after its last census value are left missing.
+#
+# The estimates are built once per data version (see
+# `aggregates.CensusAggregates.annual_estimates`) and are read-only afterwards. When a
+# later census year is appended and every neighbourhood has a value in every census year,
+# only the years from the second-to-last census year on are fitted again: a PCHIP slope
+# depends only on the neighbouring census values, so the earlier segments do not change.
+
+import numpy as np
+import pandas as pd
+
+from census_data import dwelling_types
+
+interpolation_columns = [*dwelling_types, 'average_house_value', 'shelter_costs_owned', 'shelter_costs_rented']
+interpolation_methods = ('pchip', 'linear')
+
+
+def census_grid(to_data, columns):
+    # (neighbourhoods x census years x columns) array of the census values, NaN where a
+    # neighbourhood has no row for a year
+    codes, names = pd.factorize(to_data['neighbourhood'])
+    census_years, year_positions = np.unique(to_data.index.to_numpy(dtype=np.int64), return_inverse=True)
+    grid = np.full((len(names), len(census_years), len(columns)), np.nan)
+    grid[codes, year_positions] = to_data[columns].to_numpy(dtype=np.float64)
+    return pd.Index(np.asarray(names, dtype=object), name='neighbourhood'), census_years, grid
+
+
+def fill_gaps(x, y):
+    # Fills missing values between two known ones linearly and holds the first and last
+    # known values before and after them; returns the filled array and a mask of the
+    # entries that were before the first or after the last known value
+    known = ~np.isnan(y)
+    positions = np.arange(len(x))[None, :, None]
+    previous = np.maximum.accumulate(np.where(known, positions, -1), axis=1)
+    following = np.flip(np.minimum.accumulate(np.flip(np.where(known, positions, len(x)), axis=1), axis=1), axis=1)
+    outside = (previous < 0) | (following == len(x))
+    previous, following = np.where(previous < 0, following, previous), np.where(following == len(x), previous, following)
+    previous, following = np.clip(previous, 0, len(x) - 1), np.clip(following, 0, len(x) - 1)
+    span = x[following] - x[previous]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(span > 0, (x[None, :, None] - x[previous]) / span, 0.0)
+    y0, y1 = np.take_along_axis(y, previous, axis=1), np.take_along_axis(y, following, axis=1)
+    return np.where(known, y, y0 + weight * (y1 - y0)), outside
+
+
+def end_slope(h0, h1, delta0, delta1):
+    # Three-point estimate of the slope at an end knot, limited so the curve stays monotone
+    slope = ((2 * h0 + h1) * delta0 - h0 * delta1) / (h0 + h1)
+    slope = np.where(np.sign(slope) != np.sign(delta0), 0.0, slope)
+    return np.where((np.sign(delta0) != np.sign(delta1)) & (np.abs(slope) > 3 * np.abs(delta0)), 3 * delta0, slope)
+
+
+def pchip_slopes(x, y):
+    # Fritsch-Carlson slopes at every knot along axis 1: the weighted harmonic mean of the
+    # neighbouring secants, or zero at a local extremum
+    h = np.diff(x).astype(np.float64)
+    delta = np.diff(y, axis=1) / h[None, :, None]
+    if len(x) == 2:
+        return np.concatenate([delta, delta], axis=1)
+    w1 = (2 * h[1:] + h[:-1])[None, :, None]
+    w2 = (h[1:] + 2 * h[:-1])[None, :, None]
+    before, after = delta[:, :-1], delta[:, 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        interior = np.where(before * after > 0, (w1 + w2) / (w1 / before + w2 / after), 0.0)
+    first = end_slope(h[0], h[1], delta[:, :1], delta[:, 1:2])
+    last = end_slope(h[-1], h[-2], delta[:, -1:], delta[:, -2:-1])
+    return np.concatenate([first, interior, last], axis=1)
+
+
+def basis(x, t, method):
+    # (len(t) x len(x)) matrices that map the values, and for PCHIP the slopes, at the knots
+    # x to the values of the fit at t. They only depend on the years, so they are built once
+    # and applied to every neighbourhood and metric with a matrix product.
+    segment = np.clip(np.searchsorted(x, t, side='right') - 1, 0, len(x) - 2)
+    h = (x[segment + 1] - x[segment]).astype(np.float64)
+    s = (t - x[segment]) / h
+    rows = np.arange(len(t))
+    value_weights, slope_weights = np.zeros((len(t), len(x))), np.zeros((len(t), len(x)))
+    if method == 'linear':
+        value_weights[rows, segment] = 1 - s
+        value_weights[rows, segment + 1] = s
+    else:
+        value_weights[rows, segment] = (1 + 2 * s) * (1 - s)**2
+        value_weights[rows, segment + 1] = s**2 * (3 - 2 * s)
+        slope_weights[rows, segment] = h * s * (1 - s)**2
+        slope_weights[rows, segment + 1] = h * s**2 * (s - 1)
+    return value_weights, slope_weights
+
+
+def interpolate(x, y, t, method='pchip'):
+    # Values of the fit through (x, y[:, i, :]) at the points t, along axis 1 of y
+    if method not in interpolation_methods:
+        raise ValueError(f"unknown interpolation method {method!r}, expected one of {interpolation_methods}")
+    if len(x) == 1:
+        return np.repeat(y, len(t), axis=1)
+    value_weights, slope_weights = basis(x, t, method)
+    values = value_weights @ y
+    if method == 'pchip':
+        values += slope_weights @ pchip_slopes(x, y)
+    return values
+
+
+def yearly_means(values):
+    # Mean over the neighbourhoods with an estimate, the yearly counterpart of the per-year
+    # means of the census rows
+    counts = (~np.isnan(values)).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.nansum(values, axis=0) / counts
+
+
+class AnnualEstimates:
+    def __init__(self, names, years, columns, values, census_years=None, method='pchip', complete=False, means=None):
+        # values is a (neighbourhoods x years x columns) array; complete means every
+        # neighbourhood has a census value in every census year
+        self.names = names
+        self.years = years
+        self.columns = list(columns)
+        self.values = values
+        self.census_years = census_years
+        self.method = method
+        self.complete = complete
+        self._column_positions = {column: position for position, column in enumerate(self.columns)}
+        means = yearly_means(values) if means is None else means
+        self.citywide = pd.DataFrame(means, index=pd.Index(years, name='year'), columns=self.columns)
+
+    @classmethod
+    def from_frame(cls, to_data, columns=interpolation_columns, method='pchip'):
+        # to_data is indexed by year with a neighbourhood column, like the census table
+        names, census_years, grid = census_grid(to_data, columns)
+        years = np.arange(census_years[0], census_years[-1] + 1) if len(census_years) else census_years
+        if len(names) == 0 or len(census_years) == 0:
+            return cls(names, years, columns, np.full((len(names), len(years), len(columns)), np.nan), census_years, method)
+        outside = None
+        complete = not np.isnan(grid).any()
+        if not complete:
+            grid, outside = fill_gaps(census_years, grid)
+        values = interpolate(census_years, grid, years, method)
+        if outside is not None:
+            # Years outside a neighbourhood's census values fall in a segment with a held value
+            first = np.where(outside, np.inf, census_years[None, :, None]).min(axis=1)
+            last = np.where(outside, -np.inf, census_years[None, :, None]).max(axis=1)
+            values[(years[None, :, None] < first[:, None]) | (years[None, :, None] > last[:, None])] = np.nan
+        return cls(names, years, columns, values, census_years, method, complete)
+
+    def appended(self, to_data, added):
+        # Estimates for to_data, whose last `added` rows are new census years
+        names, new_years, grid = census_grid(to_data.iloc[len(to_data) - added:], self.columns)
+        positions = self.names.get_indexer(names)
+        if (not self.complete or len(self.census_years) < 3 or len(names) != len(self.names) or (positions < 0).any()
+                or np.isnan(grid).any() or new_years[0] <= self.census_years[-1]):
+            return type(self).from_frame(to_data, self.columns, self.method)
+        new_grid = np.empty_like(grid)
+        new_grid[positions] = grid
+        # The fit goes through the census values, so the last three are read back from the
+        # estimates; the third-to-last only sets the slope at the second-to-last
+        knots = np.concatenate([self.census_years[-3:], new_years])
+        known = self.values[:, np.searchsorted(self.years, self.census_years[-3:])]
+        start = np.searchsorted(self.years, knots[1])
+        years = np.arange(self.years[0], new_years[-1] + 1)
+        refitted = interpolate(knots, np.concatenate([known, new_grid], axis=1), years[start:], self.method)
+        values = np.concatenate([self.values[:, :start], refitted], axis=1)
+        means = np.concatenate([self.citywide.to_numpy()[:start], yearly_means(refitted)])
+        return type(self)(self.names, years, self.columns, values, np.concatenate([self.census_years, new_years]), self.method, True, means)
+
+    def neighbourhood_data(self, neighbourhood, columns):
+        # Yearly estimates of one neighbourhood, like CensusAggregates.neighbourhood_data
+        row = self.names.get_loc(neighbourhood)
+        index = pd.Index(self.years, name='year')
+        if isinstance(columns, str):
+            return pd.Series(self.values[row, :, self._column_positions[columns]], index=index, name=columns)
+        return pd.DataFrame(self.values[row][:, [self._column_positions[column] for column in columns]], index=index, columns=list(columns))